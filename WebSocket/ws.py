@@ -1,30 +1,139 @@
 from fastapi import WebSocket
-from typing import List
+from typing import Dict
+import asyncio
 import logging
+import config
+from pubsub import pubsub
 
 logger = logging.getLogger(__name__)
 
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DISCONNECT = "disconnect"
+
+
+class ConnectionSender:
+    # Ограниченная очередь исходящих сообщений одного соединения и задача, которая её отправляет
+    def __init__(self, websocket: WebSocket, manager: "WebSocketManager"):
+        self.websocket = websocket
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.ws_send_queue_size)
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_json(message), config.ws_send_timeout_sec)
+                self.manager.metrics["delivered"] += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending message to WebSocket: {e}")
+            self.manager.metrics["send_errors"] += 1
+            self.manager.disconnect(self.websocket)
+
+
 class WebSocketManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, channel: str):
+        # Сообщения публикуются в канал NOTIFY, каждый воркер рассылает их своим соединениям
+        self.channel = channel
+        self.connections: Dict[WebSocket, ConnectionSender] = {}
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=config.ws_outbox_size)
+        self.publisher_task = None
+        # Ссылки на фоновые задачи: без них задача может быть собрана сборщиком мусора до завершения
+        self.tasks = set()
+        self.metrics = {
+            "broadcasts": 0,
+            "delivered": 0,
+            "dropped": 0,
+            "outbox_dropped": 0,
+            "slow_consumers": 0,
+            "slow_disconnects": 0,
+            "send_errors": 0,
+        }
+        pubsub.subscribe(channel, self.send_local)
+
+    @property
+    def active_connections(self):
+        return list(self.connections)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"New WebSocket connection. Total connections: {len(self.active_connections)}")
+        self.connections[websocket] = ConnectionSender(websocket, self)
+        logger.info(f"New WebSocket connection. Total connections: {len(self.connections)}")
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        logger.info(f"WebSocket connection closed. Total connections: {len(self.active_connections)}")
+        sender = self.connections.pop(websocket, None)
+        if sender is None:
+            return
+        if sender.task is not asyncio.current_task():
+            sender.task.cancel()
+        logger.info(f"WebSocket connection closed. Total connections: {len(self.connections)}")
 
     async def broadcast(self, message: dict):
+        # Постановка в очередь без ожидания: стоимость не зависит от числа соединений, запрос
+        # не ждёт публикации. Очередь рассчитана на пачки уведомлений; при переполнении
+        # отбрасывается самое старое сообщение и считается в outbox_dropped
         logger.info(f"Broadcasting message: {message}")
-        for connection in self.active_connections:
+        self.metrics["broadcasts"] += 1
+        if self.publisher_task is None or self.publisher_task.done():
+            self.publisher_task = asyncio.create_task(self.publish_outbox())
+        if self.outbox.full():
+            self.outbox.get_nowait()
+            self.metrics["outbox_dropped"] += 1
+        self.outbox.put_nowait(message)
+
+    async def publish_outbox(self):
+        while True:
+            message = await self.outbox.get()
             try:
-                await connection.send_json(message)
+                await pubsub.publish(self.channel, message)
             except Exception as e:
-                logger.error(f"Error sending message to WebSocket: {e}")
-                self.disconnect(connection)
+                logger.error(f"Error publishing WebSocket message: {e}")
+
+    def send_local(self, message: dict):
+        for websocket, sender in list(self.connections.items()):
+            if not sender.queue.full():
+                sender.queue.put_nowait(message)
+                continue
+
+            # Медленный клиент: очередь переполнена
+            self.metrics["slow_consumers"] += 1
+            if config.ws_overflow_policy == OVERFLOW_DISCONNECT:
+                self.metrics["slow_disconnects"] += 1
+                self.disconnect(websocket)
+                self.spawn(self.close_slow(websocket))
+            else:
+                sender.queue.get_nowait()
+                sender.queue.put_nowait(message)
+                self.metrics["dropped"] += 1
+
+    def spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def stop(self):
+        # Остановка публикации при завершении приложения
+        if self.publisher_task is not None:
+            self.publisher_task.cancel()
+            try:
+                await self.publisher_task
+            except asyncio.CancelledError:
+                pass
+            self.publisher_task = None
+
+    async def close_slow(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception as e:
+            logger.error(f"Error closing slow WebSocket: {e}")
+
+    def get_metrics(self) -> dict:
+        return {
+            **self.metrics,
+            "connections": len(self.connections),
+            "queued": sum(sender.queue.qsize() for sender in self.connections.values()),
+        }
 
-websocket_manager = WebSocketManager()
-manager = WebSocketManager()
\ No newline at end of file
+manager = WebSocketManager("ws_notifications")
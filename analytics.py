@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import json
+import logging
+from datetime import date, timedelta
+from typing import Optional
+from sqlalchemy import text
+import config
+from cache import CACHE_INVALIDATION_CHANNEL, analytics_cache
+
+logger = logging.getLogger(__name__)
+
+# Обновление итогов выполняет один воркер: остальные пропускают цикл, не дожидаясь блокировки
+ANALYTICS_LOCK_KEY = 2010020251
+
+PERIODS = ("week", "month")
+
+DELETE_ROLLUP = text("""
+    DELETE FROM sales_rollup
+    WHERE period = CAST(:period AS text)
+      AND period_start >= date_trunc(CAST(:period AS text), CAST(:since AS date)::timestamp)::date
+""")
+
+# orders -> products: категория берётся текущая на момент пересчёта
+INSERT_ROLLUP = text("""
+    INSERT INTO sales_rollup (
+        period, period_start, product_id, category_id,
+        order_count, quantity, total_weight, total_price, refreshed_at
+    )
+    SELECT CAST(:period AS text),
+           date_trunc(CAST(:period AS text), o.date::timestamp)::date,
+           o.product_id,
+           p.category_id,
+           count(*),
+           coalesce(sum(o.quantity), 0),
+           coalesce(sum(o.total_weight), 0),
+           coalesce(sum(o.total_price), 0),
+           now()
+    FROM orders AS o
+    JOIN products AS p ON p.id = o.product_id
+    WHERE o.date >= date_trunc(CAST(:period AS text), CAST(:since AS date)::timestamp)::date
+    GROUP BY 2, o.product_id, p.category_id
+""")
+
+
+def period_start(period: str, day: date) -> date:
+    # Начало недели (понедельник) или месяца, как date_trunc в PostgreSQL
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+async def refresh(
+    engine,
+    since: Optional[date] = None,
+    wait: bool = False,
+    min_interval: Optional[float] = None
+) -> bool:
+    """Пересчитывает итоги за периоды начиная с since (None — вся история) в одной транзакции.
+
+    Возвращает False, если пересчёт уже выполняет другой процесс и wait не задан, или если
+    с последнего пересчёта прошло меньше min_interval секунд.
+    """
+    async with engine.begin() as conn:
+        if wait:
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ANALYTICS_LOCK_KEY})
+        else:
+            result = await conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ANALYTICS_LOCK_KEY})
+            if not result.scalar():
+                return False
+
+        if min_interval is not None:
+            # Проверка под блокировкой: воркер, дождавшийся своей очереди сразу после
+            # соседа, видит свежие итоги и не пересчитывает их повторно
+            result = await conn.execute(
+                text("SELECT extract(epoch FROM now() - max(refreshed_at))::float8 FROM sales_rollup")
+            )
+            age = result.scalar()
+            if age is not None and age < min_interval:
+                return False
+
+        if since is None:
+            # Полный пересчёт: удаляются и итоги периодов, заказов в которых больше нет
+            await conn.execute(text("DELETE FROM sales_rollup"))
+            result = await conn.execute(text("SELECT min(date) FROM orders"))
+            rebuild_since = result.scalar()
+            if rebuild_since is not None:
+                for period in PERIODS:
+                    await conn.execute(INSERT_ROLLUP, {"period": period, "since": rebuild_since})
+        else:
+            for period in PERIODS:
+                await conn.execute(DELETE_ROLLUP, {"period": period, "since": since})
+                await conn.execute(INSERT_ROLLUP, {"period": period, "since": since})
+
+        # Сброс кеша аналитики во всех воркерах придёт после коммита, вместе с новыми итогами
+        await conn.execute(
+            text("SELECT pg_notify(:channel, :message)"),
+            {"channel": CACHE_INVALIDATION_CHANNEL, "message": json.dumps({"cache": analytics_cache.name})}
+        )
+    logger.info(f"Итоги аналитики пересчитаны начиная с {since or 'начала истории'}")
+    return True
+
+
+class AnalyticsScheduler:
+    # Периодический пересчёт последних периодов в каждом воркере под advisory-блокировкой
+    def __init__(self, interval: float, lookback_days: int):
+        self.interval = interval
+        self.lookback_days = lookback_days
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, engine):
+        if self.interval <= 0 or self.task is not None:
+            return
+        self.task = asyncio.create_task(self._run(engine))
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def _run(self, engine):
+        while True:
+            try:
+                await refresh(
+                    engine,
+                    date.today() - timedelta(days=self.lookback_days),
+                    min_interval=self.interval
+                )
+            except Exception as e:
+                logger.error(f"Ошибка пересчёта аналитики: {e}")
+            await asyncio.sleep(self.interval)
+
+
+analytics_scheduler = AnalyticsScheduler(
+    config.analytics_refresh_interval_sec,
+    config.analytics_refresh_lookback_days
+)
+
+
+async def rebuild(since: Optional[date]):
+    from database import engine
+
+    try:
+        await refresh(engine, since, wait=True)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(prog="python -m analytics", description="Итоги продаж для аналитики")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument(
+        "--since",
+        type=date.fromisoformat,
+        default=None,
+        help="Пересчитать периоды начиная с даты YYYY-MM-DD (по умолчанию вся история)"
+    )
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.since))
@@ -2,26 +2,125 @@ import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import jwt
+import hashlib
+import logging
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, UTC
 import config
+from pubsub import pubsub
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Канал NOTIFY для отзыва токенов во всех воркерах
+TOKEN_REVOCATION_CHANNEL = "token_revocation"
+
+
+class VerifiedTokenCache:
+    # Уже проверенные токены по SHA-256: повторная проверка — поиск в словаре до истечения exp
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.revoked_tokens = {}    # digest -> exp
+        self.revoked_users = {}     # username -> время отзыва
+        self.metrics = {"hits": 0, "misses": 0, "revoked": 0}
+
+    def get(self, digest: str):
+        entry = self.entries.get(digest)
+        if entry is None or entry[0] <= time.time():
+            self.entries.pop(digest, None)
+            self.metrics["misses"] += 1
+            return None
+        self.entries.move_to_end(digest)
+        self.metrics["hits"] += 1
+        return entry[1]
+
+    def set(self, digest: str, exp: float, username: str):
+        self.entries[digest] = (exp, username)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def is_revoked(self, digest: str, username: str, issued_at: float) -> bool:
+        if digest in self.revoked_tokens:
+            return True
+        # iat с долями секунды: токен, выданный сразу после отзыва, не считается отозванным
+        revoked_at = self.revoked_users.get(username)
+        return revoked_at is not None and issued_at < revoked_at
+
+    def apply_revocation(self, message: dict):
+        now = time.time()
+        if "token" in message:
+            self.revoked_tokens[message["token"]] = message.get("exp", now + config.token_timedelta_sec_val)
+            self.entries.pop(message["token"], None)
+        if "username" in message:
+            self.revoked_users[message["username"]] = message.get("revoked_at", now)
+            for digest, (_, username) in list(self.entries.items()):
+                if username == message["username"]:
+                    del self.entries[digest]
+        # Истёкшие токены из списка отзыва больше не нужны; отзыв пользователя не нужен,
+        # когда истёк последний токен, выданный до него
+        self.revoked_tokens = {digest: exp for digest, exp in self.revoked_tokens.items() if exp > now}
+        horizon = now - config.token_timedelta_sec_val
+        self.revoked_users = {
+            username: revoked_at for username, revoked_at in self.revoked_users.items() if revoked_at > horizon
+        }
+        self.metrics["revoked"] += 1
+
+    def get_metrics(self) -> dict:
+        return {
+            **self.metrics,
+            "entries": len(self.entries),
+            "revoked_tokens": len(self.revoked_tokens),
+            "revoked_users": len(self.revoked_users),
+        }
+
+
+token_cache = VerifiedTokenCache(config.token_cache_max_entries)
+pubsub.subscribe(TOKEN_REVOCATION_CHANNEL, token_cache.apply_revocation)
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+async def revoke_token(token: str):
+    message = {"token": token_digest(token), "exp": time.time() + config.token_timedelta_sec_val}
+    token_cache.apply_revocation(message)
+    await pubsub.publish(TOKEN_REVOCATION_CHANNEL, message)
+
+
+async def revoke_user(username: str):
+    # Все токены пользователя, выданные до этого момента, становятся недействительными
+    message = {"username": username, "revoked_at": time.time()}
+    token_cache.apply_revocation(message)
+    await pubsub.publish(TOKEN_REVOCATION_CHANNEL, message)
+
+
 def create_jwt_token(user_name: str):
-    expiration = datetime.now(UTC) + timedelta(seconds=config.token_timedelta_sec_val)
+    now = datetime.now(UTC)
+    expiration = now + timedelta(seconds=config.token_timedelta_sec_val)
     payload = {
         "sub": user_name,
+        "iat": now.timestamp(),
         "exp": expiration
     }
     token = jwt.encode(payload, config.sectetKey, algorithm="HS256")
     return token
 
-def verify_jwt_token(token: str = Depends(oauth2_scheme)):
+async def verify_jwt_token(token: str = Depends(oauth2_scheme)):
     if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Токен отсутствует"
         )
+
+    digest = token_digest(token)
+    username = token_cache.get(digest)
+    if username is not None:
+        return {"valid": True, "username": username}
+
     try:
         payload = jwt.decode(token, config.sectetKey, algorithms=["HS256"])
         username: str = payload.get("sub")
@@ -34,12 +133,19 @@ def verify_jwt_token(token: str = Depends(oauth2_scheme)):
             )
 
         # Проверка срока действия токена
-        if datetime.utcfromtimestamp(exp) < datetime.utcnow():
+        if exp is None or exp < time.time():
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Срок действия токена истёк"
             )
 
+        if token_cache.is_revoked(digest, username, payload.get("iat", 0)):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Токен отозван"
+            )
+
+        token_cache.set(digest, exp, username)
         return {"valid": True, "username": username}
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -0,0 +1,24 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+import config
+
+# bcrypt выполняется в отдельном ограниченном пуле потоков, а не в event loop
+executor = ThreadPoolExecutor(max_workers=config.password_hash_threads, thread_name_prefix="bcrypt")
+# Не больше задач в очереди пула, чем password_hash_queue: остальные ждут здесь
+semaphore = asyncio.Semaphore(config.password_hash_queue)
+
+
+async def run_in_executor(func, *args):
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, func, *args)
+
+
+async def hash_password(password: str) -> str:
+    hashed = await run_in_executor(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(5))
+    return hashed.decode('utf-8')
+
+
+async def check_password(password: str, hashed: str) -> bool:
+    return await run_in_executor(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
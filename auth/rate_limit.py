@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+import config
+
+
+class TokenBucketLimiter:
+    # Token bucket на ключ (IP или имя пользователя): capacity попыток, пополнение rate в секунду
+    def __init__(self, rate: float, capacity: int, max_keys: int = 10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self.rejected = 0
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self.rejected += 1
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return allowed
+
+    def retry_after(self) -> int:
+        return max(1, int(1 / self.rate))
+
+
+login_ip_limiter = TokenBucketLimiter(
+    config.login_ip_rate_per_min / 60, config.login_ip_rate_per_min
+)
+login_user_limiter = TokenBucketLimiter(
+    config.login_user_rate_per_min / 60, config.login_user_rate_per_min
+)
+
+
+def client_ip(request: Request) -> str:
+    # За прокси Render реальный адрес клиента — последний в X-Forwarded-For
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def check_login_rate(request: Request, username: str):
+    for limiter, key in ((login_ip_limiter, client_ip(request)), (login_user_limiter, username)):
+        if not limiter.allow(key):
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много попыток входа, попробуйте позже",
+                headers={"Retry-After": str(limiter.retry_after())}
+            )
+
+
+def get_metrics() -> dict:
+    return {
+        "ip_rejected": login_ip_limiter.rejected,
+        "user_rejected": login_user_limiter.rejected,
+    }
@@ -0,0 +1,18 @@
+import statistics
+from typing import List
+
+
+def summarize(latencies: List[float]) -> dict:
+    # Задержки в секундах -> миллисекунды: p50, p95, p99 и среднее
+    ms = sorted(latency * 1000 for latency in latencies)
+    quantiles = statistics.quantiles(ms, n=100) if len(ms) > 1 else ms * 99
+    return {
+        "p50": quantiles[49],
+        "p95": quantiles[94],
+        "p99": quantiles[98],
+        "mean": statistics.fmean(ms),
+    }
+
+
+def format_row(label: str, stats: dict) -> str:
+    return f"{label:<28} p50 {stats['p50']:8.2f}  p95 {stats['p95']:8.2f}  p99 {stats['p99']:8.2f}  mean {stats['mean']:8.2f} мс"
@@ -0,0 +1,94 @@
+"""GET /products: готовый снимок JSON против сериализации списка моделей на каждый запрос.
+
+Оба пути читают один и тот же список продуктов из catalog_cache, поэтому измеряется
+только то, что меняет снимок: валидация response_model и кодирование JSON (и gzip)
+на каждый запрос. Каталог синтетический и кладётся в кеш напрямую, БД не нужна.
+Прежний путь ответ не сжимал; у сжатого снимка в замер входит и распаковка в httpx.
+
+    python -m bench.bench_catalog_snapshot --products 500 --requests 2000
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from bench import format_row, summarize
+from cache import catalog_cache
+from controllers.product_controllers import ProductControllers
+from database import get_db
+from main import app
+from schemas import Product
+
+# Прежний маршрут: список моделей из кеша, FastAPI проверяет и сериализует его в каждом запросе
+models_app = FastAPI()
+
+
+@models_app.get("/products", response_model=List[Product])
+async def get_products_models(db=Depends(get_db)):
+    return await ProductControllers.get_products(db)
+
+
+def make_products(count: int) -> List[Product]:
+    return [
+        Product(
+            id=number,
+            title=f"Торт №{number}",
+            description="Бисквит, крем, ягоды. " * 4,
+            img_URL=f"https://example.com/img/{number}.jpg",
+            img_title=f"торт-{number}",
+            price_for_itm=1500 + number,
+            weight_for_itm=1.5,
+            is_active=True,
+            category_id=number % 10 + 1,
+        )
+        for number in range(1, count + 1)
+    ]
+
+
+async def measure(target: FastAPI, requests: int, gzip: bool) -> list:
+    headers = {"Accept-Encoding": "gzip" if gzip else "identity"}
+    latencies = []
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get("/products", headers=headers)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+    return latencies
+
+
+async def main(products: int, requests: int):
+    logging.disable(logging.INFO)
+    # Синтетический каталог не должен истечь посреди замера: загрузчик без БД не сработает
+    catalog_cache.ttl = float("inf")
+    catalog = make_products(products)
+
+    async def load_catalog():
+        return catalog
+
+    await catalog_cache.get_or_load("products", load_catalog)
+
+    for label, target, gzip in (
+        ("модели (прежний путь)", models_app, False),
+        ("снимок", app, False),
+        ("снимок, gzip", app, True),
+    ):
+        # Прогрев: снимок собирается при первом запросе
+        await measure(target, 10, gzip)
+        latencies = await measure(target, requests, gzip)
+        print(format_row(label, summarize(latencies)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.bench_catalog_snapshot", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--products", type=int, default=500, help="Продуктов в каталоге")
+    parser.add_argument("--requests", type=int, default=2000, help="Запросов на каждый вариант")
+    args = parser.parse_args()
+    asyncio.run(main(args.products, args.requests))
@@ -0,0 +1,100 @@
+"""Задержка POST /orders для корзины из 1, 10 и 100 заказов.
+
+Пакет из N заказов — один запрос с одной транзакцией; для сравнения те же N заказов
+отправляются N отдельными запросами, как раньше делал клиент. Запросы идут в приложение
+в процессе (httpx.ASGITransport), БД — из переменных окружения приложения (.env).
+Скрипт создаёт категорию и продукт bench-* и удаляет их вместе с заказами в конце:
+запускайте его на тестовой базе.
+
+    python -m bench.bench_orders_bulk --repeat 20
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from datetime import date, timedelta
+
+import httpx
+from sqlalchemy import delete
+
+from bench import format_row, summarize
+from database import SessionLocal, engine
+from main import app
+from models import Category, Client, Product
+
+SIZES = (1, 10, 100)
+
+
+def make_orders(product_id: int, count: int) -> list:
+    return [
+        {
+            "client_phone": f"+7999{number:07d}",
+            "client_name": "Клиент нагрузки",
+            "product_id": product_id,
+            "quantity": 1,
+            "total_price": 100,
+            "total_weight": 1,
+            "adres": "ул. Тестовая, 1",
+            "date": (date.today() + timedelta(days=1)).isoformat(),
+        }
+        for number in range(count)
+    ]
+
+
+async def measure(client: httpx.AsyncClient, product_id: int, size: int, repeat: int):
+    batch, single = [], []
+    orders = make_orders(product_id, size)
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.post("/orders", json=orders)
+        batch.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+        started = time.perf_counter()
+        for order in orders:
+            response = await client.post("/orders", json=order)
+            response.raise_for_status()
+        single.append(time.perf_counter() - started)
+    return batch, single
+
+
+async def main(repeat: int):
+    # Журнал SQL (echo=True) и INFO-логи запросов измеряли бы скорость вывода, а не обработки
+    engine.echo = False
+    logging.disable(logging.INFO)
+    suffix = uuid.uuid4().hex[:8]
+    async with SessionLocal() as db:
+        category = Category(title=f"bench-{suffix}")
+        db.add(category)
+        await db.flush()
+        product = Product(title=f"bench-{suffix}", price_for_itm=100, weight_for_itm=1, category_id=category.id)
+        db.add(product)
+        await db.flush()
+        category_id, product_id = category.id, product.id
+        await db.commit()
+
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Прогрев: соединения пула и подготовленные запросы
+            await measure(client, product_id, 1, 3)
+            for size in SIZES:
+                batch, single = await measure(client, product_id, size, repeat)
+                print(format_row(f"{size} заказ(ов), пакетом", summarize(batch)))
+                print(format_row(f"{size} заказ(ов), по одному", summarize(single)))
+    finally:
+        # Заказы удаляются каскадом вместе с продуктом
+        async with SessionLocal() as db:
+            await db.execute(delete(Product).where(Product.id == product_id))
+            await db.execute(delete(Category).where(Category.id == category_id))
+            await db.execute(delete(Client).where(Client.name == "Клиент нагрузки"))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m bench.bench_orders_bulk", description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="Повторов на каждый размер корзины")
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat))
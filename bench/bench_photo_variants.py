@@ -0,0 +1,64 @@
+"""Пропускная способность генерации вариантов фото на ядро.
+
+Синтетические JPEG (по умолчанию 3000x2000) обрабатываются generate_variants в пуле
+процессов spawn, как в приложении, при 1, 2, ... процессах. Печатается число фото
+в секунду всего и на процесс. БД не нужна, файлы пишутся во временный каталог.
+
+    python -m bench.bench_photo_variants --images 24 --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from photo_variants import Image, generate_variants
+
+
+def make_sources(directory: str, count: int, width: int, height: int) -> list:
+    # Шум с градиентом сжимается как фотография, а не как заливка одним цветом
+    paths = []
+    for number in range(count):
+        noise = Image.effect_noise((width, height), 40 + number).convert("RGB")
+        gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+        path = os.path.join(directory, f"source-{number}.jpg")
+        Image.blend(noise, gradient, 0.5).save(path, format="JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def measure(sources: list, output_dir: str, processes: int) -> float:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        # Прогрев: запуск процессов и импорт Pillow не входят в замер
+        list(executor.map(generate_variants, sources[:processes], [
+            os.path.join(output_dir, f"warmup-{number}") for number in range(processes)
+        ]))
+        started = time.perf_counter()
+        list(executor.map(generate_variants, sources, [
+            os.path.join(output_dir, f"{processes}-{number}") for number in range(len(sources))
+        ]))
+        return time.perf_counter() - started
+
+
+def main(images: int, max_processes: int, width: int, height: int):
+    if Image is None:
+        raise SystemExit("Pillow не установлен: варианты фото не создаются")
+    with tempfile.TemporaryDirectory() as directory:
+        sources = make_sources(directory, images, width, height)
+        print(f"{images} фото {width}x{height}, ядер: {os.cpu_count()}")
+        for processes in range(1, max_processes + 1):
+            elapsed = measure(sources, directory, processes)
+            rate = images / elapsed
+            print(f"процессов {processes:<3} {rate:7.2f} фото/с  {rate / processes:7.2f} фото/с на процесс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m bench.bench_photo_variants", description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=24, help="Фото на каждый замер")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Наибольшее число процессов")
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.images, args.processes, args.width, args.height)
@@ -0,0 +1,146 @@
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import config
+from pubsub import pubsub
+
+logger = logging.getLogger(__name__)
+
+# Канал NOTIFY, по которому воркеры сбрасывают кеши друг друга
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+
+caches: Dict[str, Any] = {}
+
+
+class TTLCache:
+    # Read-through кеш в памяти воркера: сбрасывается при записи, TTL — страховка
+    def __init__(self, name: str, ttl: float, max_entries: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: Dict[Any, Tuple[float, Any]] = {}
+        self.generation = 0
+        self.metrics = {"hits": 0, "misses": 0, "invalidations": 0}
+        caches[name] = self
+
+    async def get_or_load(self, key, loader: Callable[[], Awaitable[Any]]):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.metrics["hits"] += 1
+            return entry[1]
+
+        self.metrics["misses"] += 1
+        generation = self.generation
+        value = await loader()
+        # Если во время загрузки кеш сбросили, значение могло устареть — не сохраняем
+        if value is not None and generation == self.generation:
+            if len(self.entries) >= self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.generation += 1
+        self.metrics["invalidations"] += 1
+
+    async def invalidate(self):
+        self.clear()
+        try:
+            await pubsub.publish(CACHE_INVALIDATION_CHANNEL, {"cache": self.name})
+        except Exception as e:
+            logger.error(f"Не удалось разослать сброс кеша {self.name}: {e}")
+
+    def get_metrics(self) -> dict:
+        return {**self.metrics, "entries": len(self.entries)}
+
+
+@dataclass
+class PhotoBlob:
+    title: str
+    filename: str
+    content_type: str
+    data: bytes
+
+
+class ByteLRUCache:
+    # LRU-кеш, ограниченный суммарным размером значений в байтах, а не числом записей
+    def __init__(self, name: str, max_bytes: int, max_entry_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries: "OrderedDict[Any, PhotoBlob]" = OrderedDict()
+        self.resident_bytes = 0
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        caches[name] = self
+
+    def get(self, key) -> Optional[PhotoBlob]:
+        blob = self.entries.get(key)
+        if blob is None:
+            self.metrics["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.metrics["hits"] += 1
+        return blob
+
+    def set(self, key, blob: PhotoBlob):
+        size = len(blob.data)
+        if size > self.max_entry_bytes:
+            return
+        self.discard(key)
+        self.entries[key] = blob
+        self.resident_bytes += size
+        while self.resident_bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.resident_bytes -= len(evicted.data)
+            self.metrics["evictions"] += 1
+
+    def discard(self, key):
+        blob = self.entries.pop(key, None)
+        if blob is not None:
+            self.resident_bytes -= len(blob.data)
+
+    def clear(self):
+        self.entries.clear()
+        self.resident_bytes = 0
+
+    async def invalidate(self, key):
+        self.discard(key)
+        self.metrics["invalidations"] += 1
+        try:
+            await pubsub.publish(CACHE_INVALIDATION_CHANNEL, {"cache": self.name, "key": key})
+        except Exception as e:
+            logger.error(f"Не удалось разослать сброс кеша {self.name}: {e}")
+
+    def get_metrics(self) -> dict:
+        requests = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "hit_ratio": round(self.metrics["hits"] / requests, 4) if requests else 0.0,
+            "resident_bytes": self.resident_bytes,
+            "entries": len(self.entries),
+        }
+
+
+def on_invalidation(message: dict):
+    cache = caches.get(message.get("cache"))
+    if cache is None:
+        return
+    if "key" in message:
+        cache.discard(message["key"])
+    else:
+        cache.clear()
+
+pubsub.subscribe(CACHE_INVALIDATION_CHANNEL, on_invalidation)
+
+
+# Каталог: продукты и категории
+catalog_cache = TTLCache("catalog", config.catalog_cache_ttl_sec, config.catalog_cache_max_entries)
+
+# Отчёты аналитики: сбрасываются после каждого пересчёта sales_rollup
+analytics_cache = TTLCache("analytics", config.analytics_cache_ttl_sec, config.analytics_cache_max_entries)
+
+# Горячие фото по ID
+photo_cache = ByteLRUCache("photos", config.photo_cache_max_bytes, config.photo_cache_max_entry_bytes)
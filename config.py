@@ -17,4 +17,51 @@ delKey = os.getenv('DELETE_KEY')
 
 
 cookie_max_age = (12*60*60)               #  секунды
-token_timedelta_sec_val = (12*60*60)        # секунды
\ No newline at end of file
+token_timedelta_sec_val = (12*60*60)        # секунды
+
+ws_send_queue_size = 100                    # сообщений в очереди одного WebSocket-соединения
+ws_send_timeout_sec = 10                    # секунды
+ws_outbox_size = 1000                       # сообщений, ожидающих публикации в воркере
+ws_overflow_policy = os.getenv('WS_OVERFLOW_POLICY', 'drop_oldest')     # drop_oldest | disconnect
+
+catalog_cache_ttl_sec = 300                 # секунды
+catalog_cache_max_entries = 1000
+snapshot_gzip_min_bytes = 1024              # байты, меньшие ответы не сжимаются
+snapshot_gzip_level = 6
+
+http_cache_max_age_sec = 0                  # секунды, браузер всегда перепроверяет ETag
+http_cache_s_maxage_sec = 60                # секунды, для CDN
+http_cache_stale_while_revalidate_sec = 300 # секунды
+
+photo_cache_max_age_sec = (24*60*60)        # секунды, байты фото по ID не меняются
+
+photo_storage_backend = os.getenv('PHOTO_STORAGE', 'postgres')         # postgres | local
+photo_storage_dir = os.getenv('PHOTO_STORAGE_DIR', 'media/photos')
+photo_max_upload_bytes = (10*1024*1024)     # байты
+photo_upload_chunk_bytes = (256*1024)       # байты
+photo_upload_concurrency = 4                # одновременных загрузок на воркер
+
+photo_variant_widths = [320, 640, 1280]     # пиксели
+photo_variant_quality = 80                  # качество WebP
+photo_placeholder_width = 16                # пиксели
+photo_variant_processes = 2
+
+photo_cache_max_bytes = (32*1024*1024)      # байты на воркер
+photo_cache_max_entry_bytes = (4*1024*1024) # байты, большие фото не кешируются
+
+password_hash_threads = 2                   # потоков bcrypt на воркер
+password_hash_queue = 8                     # задач bcrypt в пуле одновременно
+login_ip_rate_per_min = 10                  # попыток входа с одного IP в минуту
+login_user_rate_per_min = 5                 # попыток входа под одним именем в минуту
+
+token_cache_max_entries = 10000             # проверенных JWT на воркер
+
+orders_register_clients = True              # регистрировать клиентов из новых заказов (upsert по телефону)
+
+analytics_refresh_interval_sec = 900        # период пересчёта итогов аналитики (0 — отключить)
+analytics_refresh_lookback_days = 62        # пересчитываются периоды, начиная с этой давности
+analytics_cache_ttl_sec = 300
+analytics_cache_max_entries = 256
+analytics_default_days = 365                # глубина отчётов аналитики по умолчанию
+
+orders_export_batch_size = 1000           # строк заказов на порцию серверного курсора при выгрузке
@@ -0,0 +1,104 @@
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import asc, func
+from schemas import CategorySales, ProductSales, SalesTotals
+from models import Category, Product, SalesRollup
+from analytics import period_start
+from cache import analytics_cache
+from datetime import date, timedelta
+from typing import Optional
+import logging
+import config
+
+def rollup_range(query, period: str, date_from: Optional[date], date_to: Optional[date]):
+    # Периоды, пересекающиеся с [date_from, date_to]: диапазон по первичному ключу sales_rollup
+    date_from = date_from or date.today() - timedelta(days=config.analytics_default_days)
+    query = query.where(
+        SalesRollup.period == period,
+        SalesRollup.period_start >= period_start(period, date_from)
+    )
+    if date_to is not None:
+        query = query.where(SalesRollup.period_start <= date_to)
+    return query
+
+# Суммы по группе строк итогов
+SUMS = (
+    func.sum(SalesRollup.order_count).label("order_count"),
+    func.sum(SalesRollup.quantity).label("quantity"),
+    func.sum(SalesRollup.total_weight).label("total_weight"),
+    func.sum(SalesRollup.total_price).label("total_price"),
+)
+
+class AnalyticsControllers:
+    async def get_product_sales(period: str, date_from: Optional[date], date_to: Optional[date], db: AsyncSession):
+        async def load():
+            query = rollup_range(
+                select(
+                    SalesRollup.period_start,
+                    SalesRollup.product_id,
+                    Product.title.label("product_title"),
+                    SalesRollup.order_count,
+                    SalesRollup.quantity,
+                    SalesRollup.total_weight,
+                    SalesRollup.total_price
+                ).outerjoin(Product, Product.id == SalesRollup.product_id),
+                period, date_from, date_to
+            )
+            result = await db.execute(query.order_by(asc(SalesRollup.period_start), asc(SalesRollup.product_id)))
+            return [ProductSales(**row._mapping) for row in result.all()]
+
+        try:
+            return await analytics_cache.get_or_load(("products", period, date_from, date_to), load)
+        except Exception as e:
+            logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Произошла непредвиденная ошибка"
+            )
+
+    async def get_category_sales(period: str, date_from: Optional[date], date_to: Optional[date], db: AsyncSession):
+        async def load():
+            query = rollup_range(
+                select(
+                    SalesRollup.period_start,
+                    SalesRollup.category_id,
+                    Category.title.label("category_title"),
+                    *SUMS
+                ).outerjoin(Category, Category.id == SalesRollup.category_id),
+                period, date_from, date_to
+            )
+            result = await db.execute(
+                query
+                .group_by(SalesRollup.period_start, SalesRollup.category_id, Category.title)
+                .order_by(asc(SalesRollup.period_start), asc(SalesRollup.category_id))
+            )
+            return [CategorySales(**row._mapping) for row in result.all()]
+
+        try:
+            return await analytics_cache.get_or_load(("categories", period, date_from, date_to), load)
+        except Exception as e:
+            logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Произошла непредвиденная ошибка"
+            )
+
+    async def get_totals(period: str, date_from: Optional[date], date_to: Optional[date], db: AsyncSession):
+        async def load():
+            query = rollup_range(select(SalesRollup.period_start, *SUMS), period, date_from, date_to)
+            result = await db.execute(
+                query
+                .group_by(SalesRollup.period_start)
+                .order_by(asc(SalesRollup.period_start))
+            )
+            return [SalesTotals(**row._mapping) for row in result.all()]
+
+        try:
+            return await analytics_cache.get_or_load(("totals", period, date_from, date_to), load)
+        except Exception as e:
+            logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Произошла непредвиденная ошибка"
+            )
@@ -2,12 +2,15 @@ from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from contextlib import asynccontextmanager
 from database import init_db, get_db
-from schemas import CategoryBase
+from schemas import CategoryBase, CategoryPatch
 from models import Category
+from schemas import Category as CategorySchema
+from cache import catalog_cache
+from snapshot import JSONSnapshot
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import asc
-from typing import List
+from sqlalchemy import asc, delete, update
+from typing import List, Union
 import logging
 import config
 
@@ -22,6 +25,7 @@ class CategoryControllers:
             )
             db.add(new_category)
             await db.commit()
+            await catalog_cache.invalidate()
             return { "message": "Категория добавлена успешно" }
         except IntegrityError as e:
             conflict_detail = getattr(e.orig, 'diag', {}).get('message_detail', "Категория с таким названием уже существует")        
@@ -57,9 +61,11 @@ class CategoryControllers:
     
     async def get_categories(db: AsyncSession):
         try:
-            result = await db.execute(select(Category).order_by(asc(Category.id)))
-            categories = result.scalars().all()
-            return categories
+            async def load_categories():
+                result = await db.execute(select(Category).order_by(asc(Category.id)))
+                return [CategorySchema.model_validate(category, from_attributes=True) for category in result.scalars().all()]
+
+            return await catalog_cache.get_or_load("categories", load_categories)
         except HTTPException as http_ex:
             raise http_ex
         except Exception as e:
@@ -69,12 +75,23 @@ class CategoryControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
+    async def get_categories_snapshot(db: AsyncSession):
+        async def build_snapshot():
+            categories = await CategoryControllers.get_categories(db)
+            return JSONSnapshot([category.model_dump(mode="json") for category in categories])
+
+        return await catalog_cache.get_or_load("categories_snapshot", build_snapshot)
+            
     async def get_category_by_id(id: int, db: AsyncSession):
         try:
-            result = await db.execute(select(Category).filter(Category.id == id))
-            user = result.scalars().first()
-            if user:
-                return user
+            async def load_category():
+                result = await db.execute(select(Category).filter(Category.id == id))
+                category = result.scalars().first()
+                return CategorySchema.model_validate(category, from_attributes=True) if category else None
+
+            category = await catalog_cache.get_or_load(("category", id), load_category)
+            if category:
+                return category
             else:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -89,16 +106,27 @@ class CategoryControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
-    async def update_category(id: int, category: CategoryBase, db: AsyncSession):
+    async def update_category(id: int, category: Union[CategoryBase, CategoryPatch], db: AsyncSession, partial: bool = False):
         try:
-            result = await db.execute(select(Category).filter(Category.id == id))
-            existing_category = result.scalars().first()
-            if existing_category:
-                existing_category.title = category.title
-                existing_category.description = category.description
-                existing_category.img_URL=category.img_URL
-                existing_category.img_title=category.img_title
+            # PUT обновляет все столбцы, PATCH — только переданные
+            values = category.model_dump(exclude_unset=partial)
+            if not values:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Нет полей для обновления"
+                )
+
+            # Один запрос UPDATE ... RETURNING: отсутствие строки означает, что категории нет
+            result = await db.execute(
+                update(Category)
+                .where(Category.id == id)
+                .values(**values)
+                .returning(Category.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.scalar_one_or_none() is not None:
                 await db.commit()
+                await catalog_cache.invalidate()
                 return {"message": "Категория обновлена успешно"}
             else:
                 raise HTTPException(
@@ -122,11 +150,15 @@ class CategoryControllers:
         
     async def del_category(id: int, db: AsyncSession):
         try:
-            result = await db.execute(select(Category).filter(Category.id == id))
-            category = result.scalars().first()
-            if category:
-                await db.delete(category)
+            result = await db.execute(
+                delete(Category)
+                .where(Category.id == id)
+                .returning(Category.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.scalar_one_or_none() is not None:
                 await db.commit()
+                await catalog_cache.invalidate()
                 return {"message": "Категория удалена успешно"}
             else:
                 raise HTTPException(
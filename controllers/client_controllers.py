@@ -1,74 +1,109 @@
-from fastapi import HTTPException, status
+from fastapi import HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from asyncpg.exceptions import UniqueViolationError
 from contextlib import asynccontextmanager
 from database import init_db, get_db
-from schemas import ClientBase
-from models import Client
+from schemas import ClientBase, ClientPatch, ClientStats as ClientStatsSchema
+from models import Client, ClientStats
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import asc
-from typing import List
+from sqlalchemy import asc, delete, false, func, true, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import List, Optional, Union
 import logging
 import config
 import json
+import re
+
+PHONE_QUERY_RE = re.compile(r"^\+?[\d\s()\-]+$")
+
+def escape_like(value: str) -> str:
+    # Символы шаблона LIKE в запросе пользователя ищутся буквально
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def client_search_condition(q: str):
+    """Условие поиска клиента: номер с '+' — префикс телефона, цифры — подстрока телефона, иначе — подстрока имени."""
+    q = q.strip()
+    if PHONE_QUERY_RE.match(q):
+        digits = re.sub(r"\D", "", q)
+        if q.startswith("+"):
+            # ix_clients_phone_pattern (text_pattern_ops)
+            return Client.phone.like(f"+{escape_like(digits)}%", escape="\\")
+        # ix_clients_phone_trgm
+        return Client.phone.like(f"%{escape_like(digits)}%", escape="\\")
+    # ix_clients_name_trgm
+    return Client.name.ilike(f"%{escape_like(q)}%", escape="\\")
 
 class ClientControllers: 
-    async def create_client(client: ClientBase, db: AsyncSession):
-        try:
-            # Проверяем, существует ли клиент с таким номером телефона
-            existing_client = await db.execute(select(Client).filter(Client.phone == client.phone))
-            existing_client = existing_client.scalar()
+    async def upsert_clients(clients: List[dict], db: AsyncSession):
+        """Регистрирует клиентов по телефону: INSERT ... ON CONFLICT (phone) DO NOTHING RETURNING.
 
+        Возвращает строки (id, name, phone, created) для каждого уникального телефона,
+        отсортированные по телефону; существующие клиенты не изменяются. Коммит выполняет
+        вызывающий код.
+        """
+        # Повторы телефона внутри пакета схлопываются (побеждает первое имя). Вставка идёт
+        # в порядке телефонов: параллельные пакеты ждут друг друга в одном порядке, без взаимоблокировок
+        unique_clients = {}
+        for each_client in clients:
+            unique_clients.setdefault(each_client["phone"], each_client["name"])
+        if not unique_clients:
+            return []
+        phones = sorted(unique_clients)
 
+        # DO NOTHING не пишет версии существующих строк и не запускает триггеры UPDATE.
+        # Строки, вставленные в CTE, не видны остальной части запроса, поэтому SELECT из clients
+        # возвращает только клиентов, которые уже были
+        inserted = pg_insert(Client).values([
+            {"name": unique_clients[phone], "phone": phone} for phone in phones
+        ]).on_conflict_do_nothing(
+            index_elements=[Client.phone]
+        ).returning(Client.id, Client.name, Client.phone).cte("inserted")
+        statement = union_all(
+            select(inserted.c.id, inserted.c.name, inserted.c.phone, true().label("created")),
+            select(Client.id, Client.name, Client.phone, false().label("created")).where(Client.phone.in_(phones))
+        ).order_by("phone")
+        result = await db.execute(statement)
+        rows = result.all()
 
-            if existing_client:
-                # Преобразуем объект SQLAlchemy в словарь
-                existing_client_data = {
-                    "id": existing_client.id,
-                    "name": existing_client.name,
-                    "phone": existing_client.phone
-                }
+        # Клиент, добавленный параллельной транзакцией после начала запроса, не попал
+        # ни в одну часть: он уже зафиксирован и виден новому запросу
+        missing = set(phones) - {row.phone for row in rows}
+        if missing:
+            result = await db.execute(
+                select(Client.id, Client.name, Client.phone, false().label("created"))
+                .where(Client.phone.in_(missing))
+            )
+            rows = sorted([*rows, *result.all()], key=lambda row: row.phone)
+        return rows
 
-                # Вызываем исключение с деталями ошибки
-                raise HTTPException(
-                    status_code=400,
-                    detail={
-                        "error": "Клиент с таким номером телефона уже существует",
-                        "client": existing_client_data
-                    }
-                )
-            
-            # Создаем нового клиента
-            new_client = Client(name=client.name, phone=client.phone)
-            db.add(new_client)
+    async def create_client(client: ClientBase, response: Response, db: AsyncSession):
+        try:
+            rows = await ClientControllers.upsert_clients(
+                [{"name": client.name, "phone": client.phone}], db
+            )
             await db.commit()
-            await db.refresh(new_client)
+            row = rows[0]
+
+            # 201 — клиент создан, 200 — клиент с таким телефоном уже был
+            if row.created:
+                response.status_code = status.HTTP_201_CREATED
+                message = "Клиент добавлен успешно"
+            else:
+                response.status_code = status.HTTP_200_OK
+                message = "Клиент с таким номером телефона уже существует"
 
-            # Возвращаем данные о новом клиенте
             return {
-                "message": "Клиент добавлен успешно",
+                "message": message,
+                "created": row.created,
                 "client": {
-                    "id": new_client.id,
-                    "name": new_client.name,
-                    "phone": new_client.phone
+                    "id": row.id,
+                    "name": row.name,
+                    "phone": row.phone
                 }
             }
         except HTTPException as http_ex:
             raise http_ex
-        except IntegrityError as e:
-            await db.rollback()
-            logging.error(f"Ошибка IntegrityError: {str(e)}")
-            if "unique constraint" in str(e).lower():
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Клиент с таким номером телефона уже существует"
-                )
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Ошибка при добавлении клиента"
-            )
-
         except Exception as e:
             await db.rollback()
             logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
@@ -77,10 +112,26 @@ class ClientControllers:
                 detail="Произошла непредвиденная ошибка"
             )
     
-    async def get_clients(db: AsyncSession):
+    async def get_clients(
+        db: AsyncSession,
+        response: Response,
+        limit: int,
+        after: Optional[int] = None,
+        q: Optional[str] = None
+    ):
         try:
-            result = await db.execute(select(Client).order_by(asc(Client.id)))
+            query = select(Client)
+            if q:
+                query = query.where(client_search_condition(q))
+            if after is not None:
+                query = query.where(Client.id > after)
+            result = await db.execute(query.order_by(asc(Client.id)).limit(limit + 1))
             clients = result.scalars().all()
+
+            # Лишняя строка означает, что есть следующая страница
+            if len(clients) > limit:
+                clients = clients[:limit]
+                response.headers["X-Next-Cursor"] = str(clients[-1].id)
             return clients
         except HTTPException as http_ex:
             raise http_ex
@@ -91,6 +142,42 @@ class ClientControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
+    async def get_client_stats(id: int, db: AsyncSession):
+        try:
+            # Готовая сводка из client_stats: одна строка по первичному ключу, без агрегации заказов
+            result = await db.execute(
+                select(
+                    Client.id,
+                    Client.phone,
+                    func.coalesce(ClientStats.order_count, 0).label("order_count"),
+                    func.coalesce(ClientStats.total_spent, 0).label("total_spent"),
+                    ClientStats.last_order_date
+                )
+                .outerjoin(ClientStats, ClientStats.client_phone == Client.phone)
+                .where(Client.id == id)
+            )
+            row = result.one_or_none()
+            if row is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Клиент не найден"
+                )
+            return ClientStatsSchema(
+                client_id=row.id,
+                client_phone=row.phone,
+                order_count=row.order_count,
+                total_spent=row.total_spent,
+                last_order_date=row.last_order_date
+            )
+        except HTTPException as http_ex:
+            raise http_ex
+        except Exception as e:
+            logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Произошла непредвиденная ошибка"
+            )
+
     async def get_client_by_id(id: int, db: AsyncSession):
         try:
             result = await db.execute(select(Client).filter(Client.id == id))
@@ -111,13 +198,24 @@ class ClientControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
-    async def update_client(id: int, client: ClientBase, db: AsyncSession):
+    async def update_client(id: int, client: Union[ClientBase, ClientPatch], db: AsyncSession, partial: bool = False):
         try:
-            result = await db.execute(select(Client).filter(Client.id == id))
-            existing_client = result.scalars().first()
-            if existing_client:
-                existing_client.name = client.name
-                existing_client.phone = client.phone
+            # PUT обновляет все столбцы, PATCH — только переданные
+            values = client.model_dump(exclude_unset=partial)
+            if not values:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Нет полей для обновления"
+                )
+
+            result = await db.execute(
+                update(Client)
+                .where(Client.id == id)
+                .values(**values)
+                .returning(Client.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.scalar_one_or_none() is not None:
                 await db.commit()
                 return {"message": "Данные клиента обновлены успешно"}
             else:
@@ -143,10 +241,13 @@ class ClientControllers:
     
     async def del_client(id: int, db: AsyncSession):
         try:
-            result = await db.execute(select(Client).filter(Client.id == id))
-            client = result.scalars().first()
-            if client:
-                await db.delete(client)
+            result = await db.execute(
+                delete(Client)
+                .where(Client.id == id)
+                .returning(Client.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.scalar_one_or_none() is not None:
                 await db.commit()
                 return {"message": "Клиент удален успешно"}
             else:
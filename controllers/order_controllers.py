@@ -1,143 +1,232 @@
-from fastapi import HTTPException, status
+from fastapi import HTTPException, status, Response
 from pydantic import BaseModel, FieldValidationInfo, field_validator, ValidationError
-from fastapi.responses import JSONResponse
-from WebSocket.ws import websocket_manager, manager, logger
+from fastapi.responses import JSONResponse, StreamingResponse
+from WebSocket.ws import manager, logger
 from sqlalchemy.ext.asyncio import AsyncSession
 import re
+import csv
+import io
+import json
 from datetime import date
 from sqlalchemy.exc import IntegrityError, OperationalError
 from contextlib import asynccontextmanager
-from database import init_db, get_db
-from schemas import OrderBase
+from database import init_db, get_db, SessionLocal
+from schemas import OrderBase, OrderPatch
 from models import Order
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import asc
-from typing import List, Union
+from sqlalchemy import asc, desc, any_, bindparam, delete, insert, tuple_, update, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from typing import List, Optional, Union
 import logging
-from models import Product
+from models import Client, Product
+from controllers.client_controllers import ClientControllers
 import config
 
+# Столбцы заказа, которые меняются через PUT/PATCH (created_at и updated_at ведёт БД)
+ORDER_UPDATE_FIELDS = {
+    "client_phone", "client_name", "product_id", "quantity", "total_price",
+    "total_weight", "adres", "comment", "is_active", "date",
+}
+
+# Столбцы выгрузки заказов в порядке колонок CSV
+EXPORT_COLUMNS = (
+    Order.id, Order.date, Order.client_phone, Order.client_name, Order.product_id,
+    Order.quantity, Order.total_price, Order.total_weight, Order.adres, Order.comment,
+    Order.is_active, Order.created_at, Order.updated_at,
+)
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+def format_export_chunk(rows, export_format: str) -> str:
+    if export_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+    return "".join(
+        json.dumps(dict(row._mapping), ensure_ascii=False, default=str) + "\n"
+        for row in rows
+    )
+
+async def stream_orders_export(query, export_format: str):
+    # Своя сессия: сессия из get_db закрывается раньше, чем ответ будет дочитан клиентом
+    if export_format == "csv":
+        # BOM, чтобы Excel открыл кириллицу в UTF-8
+        yield "\ufeff" + format_export_chunk([[column.key for column in EXPORT_COLUMNS]], "csv")
+    exported = 0
+    try:
+        async with SessionLocal() as db:
+            # Серверный курсор: в памяти одновременно не больше одной порции строк
+            result = await db.stream(
+                query.execution_options(yield_per=config.orders_export_batch_size)
+            )
+            async for rows in result.partitions():
+                exported += len(rows)
+                yield format_export_chunk(rows, export_format)
+    except Exception as e:
+        # Заголовки уже отправлены: обрыв потока — единственный способ сообщить об ошибке
+        logging.error(f"Ошибка выгрузки заказов после {exported} строк: {str(e)}")
+        raise
+    logger.info(f"Выгружено заказов: {exported}")
+
+def encode_order_cursor(order: Order) -> str:
+    return f"{order.date.isoformat()}_{order.id}"
+
+def decode_order_cursor(cursor: str):
+    try:
+        cursor_date, cursor_id = cursor.split("_", 1)
+        return date.fromisoformat(cursor_date), int(cursor_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Неверный курсор пагинации"
+        )
+
+
 class OrderControllers: 
-    async def create_order(order: OrderBase, db: AsyncSession):
-        async def each_order(eachOrder: OrderBase):
-            try:
-                new_order = Order(
-                    client_phone=eachOrder.client_phone,
-                    client_name=eachOrder.client_name,
-                    product_id=eachOrder.product_id,
-                    quantity=eachOrder.quantity,
-                    total_price=eachOrder.total_price,
-                    total_weight=eachOrder.total_weight,
-                    adres=eachOrder.adres,
-                    comment=eachOrder.comment,
-                    is_active=eachOrder.is_active,
-                    date=eachOrder.date
-                )
-                db.add(new_order)
-                await db.commit()
-                await db.refresh(new_order)
-                try:
-                    result = await db.execute(select(Product).order_by(asc(Product.id)))
-                    products = result.scalars().all()
-                except HTTPException as http_ex:
-                    raise http_ex
-                except Exception as e:
-                    logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail="Произошла непредвиденная ошибка"
-                    )
-                    
-                product = next((p for p in products if p.id == eachOrder.product_id), None)
-                notification_message = {
-                    "client_name": eachOrder.client_name,
-                    "client_phone": eachOrder.client_phone,
-                    "product_id": product.title if product else "Неизвестный товар",
-                    "quantity": eachOrder.quantity,
-                    "message": "Заказ добавлен успешно"
-                }
-                
-                """ return {"message": "Заказ добавлен успешно"}, JSONResponse(content=notification_message, status_code=201) """
-                try:
-                    await websocket_manager.broadcast(notification_message)
-                    await manager.broadcast(notification_message)
-                except Exception as ws_error:
-                    logging.error(f"Ошибка при отправке уведомления через WebSocket: {str(ws_error)}")
-                return JSONResponse(content=notification_message, status_code=201)
-            
-            except IntegrityError as e:
-                error_code = getattr(e.orig, 'pgcode', None)
-                error_message = e.args[0]
-                
-                match = re.search(r"Key \((.*?)\)=\((.*?)\)", error_message)
-                if match:
-                    key = match.group(1)
-                    value = match.group(2)
-                else:
-                    print("Не удалось извлечь данные из сообщения об ошибке.")
-                
-                if error_code == "23503":
-                    detail = f"'{key}' с значением '{value}' не найдено"
-                elif error_code == "23505":
-                    detail = "Заказ с таким названием уже существует"
-                else:
-                    detail = "Произошла непредвиденная ошибка"
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=detail
-                )
-            except HTTPException as http_ex:
-                raise http_ex
-            except Exception as e:
-                logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Произошла непредвиденная ошибка"
-                )
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
-            except IntegrityError as e:
-                await db.rollback()
-                logger.error(f"Integrity error: {e}")
+    async def create_order(order: Union[OrderBase, List[OrderBase]], db: AsyncSession):
+        # Одиночный заказ обрабатываем как пакет из одного элемента
+        if isinstance(order, OrderBase):
+            orders = [order]
+            success_message = "Заказ добавлен успешно"
+        elif isinstance(order, list) and order:
+            orders = order
+            success_message = "Заказы добавлены успешно"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Неверный формат данных"
+            )
+
+        try:
+            # Названия продуктов для уведомлений одним запросом: WHERE id = ANY(...)
+            product_ids = list({each_order.product_id for each_order in orders})
+            result = await db.execute(
+                select(Product.id, Product.title)
+                .where(Product.id == any_(bindparam("product_ids", product_ids, type_=ARRAY(Integer))))
+            )
+            product_titles = dict(result.all())
+
+            missing_ids = [product_id for product_id in product_ids if product_id not in product_titles]
+            if missing_ids:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Ошибка при создании заказа"
+                    detail=f"'product_id' с значением '{missing_ids[0]}' не найдено"
                 )
-            except Exception as e:
-                await db.rollback()
-                logger.error(f"Unexpected error: {e}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Произошла непредвиденная ошибка"
+
+            # Все заказы вставляются одним INSERT ... VALUES (...), (...) RETURNING в одной транзакции
+            rows = [
+                {
+                    "client_phone": each_order.client_phone,
+                    "client_name": each_order.client_name,
+                    "product_id": each_order.product_id,
+                    "quantity": each_order.quantity,
+                    "total_price": each_order.total_price,
+                    "total_weight": each_order.total_weight,
+                    "adres": each_order.adres,
+                    "comment": each_order.comment,
+                    "is_active": each_order.is_active,
+                    "date": each_order.date,
+                }
+                for each_order in orders
+            ]
+            # Клиенты из заказов регистрируются в той же транзакции одним upsert по телефону
+            if config.orders_register_clients:
+                await ClientControllers.upsert_clients(
+                    [{"name": row["client_name"], "phone": row["client_phone"]} for row in rows], db
                 )
 
-        # Если пришел одиночный заказ
-        if isinstance(order, OrderBase):
-            await each_order(order)
-            return {"message": "Заказ добавлен успешно"}
+            result = await db.execute(insert(Order).values(rows).returning(Order.id))
+            order_ids = result.scalars().all()
+            await db.commit()
+
+        except IntegrityError as e:
+            await db.rollback()
+            error_code = getattr(e.orig, 'pgcode', None)
+            error_message = e.args[0]
 
-        # Если пришел список заказов
-        elif isinstance(order, list):
-            for ord in order:
-                await each_order(ord)
-            return {"message": "Заказы добавлены успешно"}
+            match = re.search(r"Key \((.*?)\)=\((.*?)\)", error_message)
+            if match:
+                key = match.group(1)
+                value = match.group(2)
+            else:
+                key, value = None, None
 
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Неверный формат данных"
-        )
+            if error_code == "23503":
+                detail = f"'{key}' с значением '{value}' не найдено"
+            elif error_code == "23505":
+                detail = "Заказ с таким названием уже существует"
+            else:
+                detail = "Произошла непредвиденная ошибка"
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=detail
+            )
+        except HTTPException as http_ex:
+            raise http_ex
+        except Exception as e:
+            await db.rollback()
+            logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Произошла непредвиденная ошибка"
+            )
+
+        # Уведомления отправляются только после успешного коммита всего пакета
+        for each_order in orders:
+            notification_message = {
+                "client_name": each_order.client_name,
+                "client_phone": each_order.client_phone,
+                "product_id": product_titles.get(each_order.product_id, "Неизвестный товар"),
+                "quantity": each_order.quantity,
+                "message": "Заказ добавлен успешно"
+            }
+            await manager.broadcast(notification_message)
+
+        logger.info(f"Добавлено заказов: {len(order_ids)}")
+        return {"message": success_message}
 
     
-    async def get_orders(db: AsyncSession):
+    async def get_orders(
+        db: AsyncSession,
+        response: Response,
+        limit: int,
+        after: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        is_active: Optional[bool] = None,
+        product_id: Optional[int] = None,
+        client_phone: Optional[str] = None,
+    ):
         try:
-            current_date = date.today()
+            # По умолчанию, как и раньше, отдаются заказы начиная с сегодняшнего дня
+            query = select(Order).where(Order.date >= (date_from or date.today()))
+            if date_to is not None:
+                query = query.where(Order.date <= date_to)
+            if is_active is not None:
+                query = query.where(Order.is_active == is_active)
+            if product_id is not None:
+                query = query.where(Order.product_id == product_id)
+            if client_phone is not None:
+                query = query.where(Order.client_phone == client_phone)
+
+            # Keyset-пагинация по (date, id): страница не зависит от размера таблицы
+            if after:
+                after_date, after_id = decode_order_cursor(after)
+                query = query.where(tuple_(Order.date, Order.id) > tuple_(after_date, after_id))
+
             result = await db.execute(
-                select(Order)
-                .where(Order.date >= current_date)
-                .order_by(asc(Order.id))
+                query
+                .order_by(asc(Order.date), asc(Order.id))
+                .limit(limit + 1)
             )
             orders = result.scalars().all()
+
+            if len(orders) > limit:
+                orders = orders[:limit]
+                response.headers["X-Next-Cursor"] = encode_order_cursor(orders[-1])
             return orders
         except HTTPException as http_ex:
             raise http_ex
@@ -148,6 +237,74 @@ class OrderControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
+    async def get_client_orders(
+        client_id: int,
+        db: AsyncSession,
+        response: Response,
+        limit: int,
+        after: Optional[str] = None,
+    ):
+        try:
+            result = await db.execute(select(Client.phone).where(Client.id == client_id))
+            client_phone = result.scalar_one_or_none()
+            if client_phone is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Клиент не найден"
+                )
+
+            # История от новых заказов к старым: обратный проход по ix_orders_client_phone_date_id
+            query = select(Order).where(Order.client_phone == client_phone)
+            if after:
+                after_date, after_id = decode_order_cursor(after)
+                query = query.where(tuple_(Order.date, Order.id) < tuple_(after_date, after_id))
+
+            result = await db.execute(
+                query
+                .order_by(desc(Order.date), desc(Order.id))
+                .limit(limit + 1)
+            )
+            orders = result.scalars().all()
+
+            if len(orders) > limit:
+                orders = orders[:limit]
+                response.headers["X-Next-Cursor"] = encode_order_cursor(orders[-1])
+            return orders
+        except HTTPException as http_ex:
+            raise http_ex
+        except Exception as e:
+            logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Произошла непредвиденная ошибка"
+            )
+
+    def export_orders(
+        export_format: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        is_active: Optional[bool] = None,
+        product_id: Optional[int] = None,
+    ) -> StreamingResponse:
+        query = select(*EXPORT_COLUMNS)
+        if date_from is not None:
+            query = query.where(Order.date >= date_from)
+        if date_to is not None:
+            query = query.where(Order.date <= date_to)
+        if is_active is not None:
+            query = query.where(Order.is_active == is_active)
+        if product_id is not None:
+            query = query.where(Order.product_id == product_id)
+        # Порядок ix_orders_date_id: строки идут с диска без сортировки всей выборки
+        query = query.order_by(asc(Order.date), asc(Order.id))
+
+        filename = f"orders_{date_from or 'all'}_{date_to or 'all'}.{export_format}"
+        return StreamingResponse(
+            stream_orders_export(query, export_format),
+            media_type=EXPORT_MEDIA_TYPES[export_format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
     async def get_order_by_id(id: int, db: AsyncSession):
         try:
             result = await db.execute(select(Order).filter(Order.id == id))
@@ -168,26 +325,29 @@ class OrderControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
-    async def update_order(id: int, order:OrderBase, db: AsyncSession):
+    async def update_order(id: int, order: Union[OrderBase, OrderPatch], db: AsyncSession, partial: bool = False):
         try:
-            result = await db.execute(select(Order).filter(Order.id == id))
-            existing_order = result.scalars().first()
+            # PUT обновляет все столбцы, PATCH — только переданные
+            values = order.model_dump(include=ORDER_UPDATE_FIELDS, exclude_unset=partial)
+            if not values:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Нет полей для обновления"
+                )
 
-            if not existing_order:
+            # Один запрос UPDATE ... RETURNING: отсутствие строки означает, что заказа нет
+            result = await db.execute(
+                update(Order)
+                .where(Order.id == id)
+                .values(**values)
+                .returning(Order.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.scalar_one_or_none() is None:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Заказ не найден"
                 )
-            existing_order.client_phone = order.client_phone
-            existing_order.client_name = order.client_name
-            existing_order.product_id = order.product_id
-            existing_order.quantity = order.quantity
-            existing_order.total_price = order.total_price
-            existing_order.total_weight = order.total_weight
-            existing_order.adres = order.adres
-            existing_order.comment = order.comment
-            existing_order.is_active = order.is_active
-            existing_order.date = order.date
 
             await db.commit()
             return {"message": "Заказ обновлен успешно"}
@@ -215,10 +375,13 @@ class OrderControllers:
             
     async def del_order(id: int, db: AsyncSession):
         try:
-            result = await db.execute(select(Order).filter(Order.id == id))
-            order = result.scalars().first()
-            if order:
-                await db.delete(order)
+            result = await db.execute(
+                delete(Order)
+                .where(Order.id == id)
+                .returning(Order.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.scalar_one_or_none() is not None:
                 await db.commit()
                 return {"message": "Заказ удален успешно"}
             else:
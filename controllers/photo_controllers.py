@@ -1,4 +1,5 @@
-from fastapi import HTTPException, status, UploadFile
+from fastapi import HTTPException, status, UploadFile, Request, Response
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from contextlib import asynccontextmanager
 from database import init_db, get_db
@@ -6,11 +7,20 @@ from schemas import PhotoBase, PhotoForUpdate
 from models import Photo
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import asc
-from typing import List
+from sqlalchemy import asc, case, delete, func, text, update
+from sqlalchemy.orm import aliased
+from typing import List, Optional
+import asyncio
 import logging
+import os
 import base64
 import config
+from http_cache import RangeNotSatisfiable, is_not_modified, parse_range
+from photo_storage import UploadTooLarge, local_storage, photo_storage, read_photo_data
+from cache import PhotoBlob, photo_cache
+from photo_variants import (
+    VARIANT_MEDIA_TYPE, VARIANTS, delete_variants, has_failed, is_raster_image, schedule_variants, variant_path
+)
 
 from fastapi import HTTPException
 from sqlalchemy.future import select
@@ -18,26 +28,99 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from models import Photo  # Это SQLAlchemy модель
 from schemas import Photo as PhotoSchema  # Это Pydantic модель
+from schemas import PhotoMeta
+
+def bytes_response(request: Request, headers: dict, content_type: str, data: bytes) -> Response:
+    # Ответ из байтов в памяти с поддержкой одного диапазона Range
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == headers["ETag"]):
+        try:
+            byte_range = parse_range(range_header, len(data))
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{len(data)}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            return Response(
+                content=data[start:end + 1],
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type=content_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{len(data)}"}
+            )
+    return Response(content=data, media_type=content_type, headers=headers)
+
+# Ограничение числа одновременно обрабатываемых загрузок в воркере
+upload_semaphore = asyncio.Semaphore(config.photo_upload_concurrency)
+
+# Первый ключ advisory-блокировки по хешу содержимого, второй — hashtext(content_hash)
+PHOTO_HASH_LOCK_KEY = 2010020252
 
 class PhotoControllers:
+    async def lock_content_hash(content_hash: str, db: AsyncSession):
+        # Загрузка и удаление файла одного хеша выполняются по очереди; блокировка снимается на COMMIT/ROLLBACK
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(:key, hashtext(:hash))"),
+            {"key": PHOTO_HASH_LOCK_KEY, "hash": content_hash}
+        )
+
     async def add_photo(title: str, file: UploadFile, db: AsyncSession):
+        content_hash = None
         try:
-            # Считываем файл в бинарный формат
-            file_data = await file.read()
+            # Семафор держится до фиксации строки: байты загрузки в памяти до INSERT
+            async with upload_semaphore:
+                # Файл читается порциями: хеш считается на лету, размер ограничен. Блокировка по хешу
+                # берётся до переноса файла на место и держится до COMMIT строки: release_file
+                # не удалит файл, который загрузка уже сочла существующим
+                content_hash, size, stored_data, head = await photo_storage.save_upload(
+                    file, config.photo_max_upload_bytes,
+                    lock=lambda content_hash: PhotoControllers.lock_content_hash(content_hash, db)
+                )
 
-            # Создаем новый объект Photo
-            new_photo = Photo(
-                title=title,
-                filename=file.filename,
-                content_type=file.content_type,
-                data=file_data
-            )
+                # Такое содержимое уже есть: новая строка ссылается на него по content_hash,
+                # байты второй раз не сохраняются. FOR KEY SHARE не даёт удалить строку, хранящую
+                # байты в БД, до COMMIT: иначе триггер передачи data не увидит новую строку
+                result = await db.execute(
+                    select(Photo.id, Photo.data.is_not(None).label("has_data"))
+                    .filter(Photo.content_hash == content_hash)
+                    .order_by(Photo.data.is_(None))
+                    .limit(1)
+                    .with_for_update(key_share=True)
+                )
+                existing = result.first()
+                if existing is not None and existing.has_data:
+                    stored_data = None
+
+                # Создаем новый объект Photo
+                new_photo = Photo(
+                    title=title,
+                    filename=file.filename,
+                    content_type=file.content_type,
+                    data=stored_data,
+                    size=size,
+                    content_hash=content_hash
+                )
 
-            # Сохраняем в базу данных
-            db.add(new_photo)
-            await db.commit()
+                # Сохраняем в базу данных
+                db.add(new_photo)
+                await db.commit()
+
+            # Уменьшенные копии и превью создаются в пуле процессов в фоне, только для растровых
+            # форматов и только для нового содержимого: у повторной загрузки они уже есть
+            if existing is None and is_raster_image(head):
+                base_path = local_storage.path(content_hash)
+                schedule_variants(stored_data if stored_data is not None else base_path, base_path)
             return {"message": "Фото добавлено успешно"}
+        except UploadTooLarge:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Размер фото не должен превышать {config.photo_max_upload_bytes // (1024 * 1024)} МБ"
+            )
         except IntegrityError as e:
+            await db.rollback()
+            await PhotoControllers.release_file(content_hash, db)
             # Проверка на уникальность
             error_message = str(e.orig) if hasattr(e, 'orig') else "Произошла ошибка базы данных"
             if "unique constraint" in error_message.lower():
@@ -49,6 +132,8 @@ class PhotoControllers:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Ошибка при добавлении фото"
             )
+        except HTTPException as http_ex:
+            raise http_ex
         except Exception as e:
             logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
             raise HTTPException(
@@ -65,10 +150,9 @@ class PhotoControllers:
             # Преобразуем объекты SQLAlchemy Photo в Pydantic модели
             photo_schemas = []
             for photo in photos:
-                photo_dict = photo.__dict__  # Получаем словарь атрибутов объекта
-                if "data" in photo_dict:
-                    # Преобразуем бинарные данные в строку base64
-                    photo_dict["data"] = base64.b64encode(photo_dict["data"]).decode("utf-8")
+                photo_dict = photo.__dict__.copy()  # Получаем словарь атрибутов объекта
+                # Преобразуем бинарные данные в строку base64
+                photo_dict["data"] = base64.b64encode(await read_photo_data(photo, db)).decode("utf-8")
                 photo_schema = PhotoSchema(**photo_dict)  # Преобразуем в Pydantic модель
                 photo_schemas.append(photo_schema)
             return photo_schemas
@@ -79,20 +163,57 @@ class PhotoControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
+    async def get_photos_meta(db: AsyncSession, response: Response, limit: int, after: Optional[int] = None):
+        try:
+            # Только метаданные: столбец data не читается, память не зависит от числа фото
+            query = select(
+                Photo.id, Photo.title, Photo.filename, Photo.content_type, Photo.size, Photo.content_hash
+            )
+            if after is not None:
+                query = query.where(Photo.id > after)
+            result = await db.execute(query.order_by(asc(Photo.id)).limit(limit + 1))
+            rows = result.all()
+
+            if len(rows) > limit:
+                rows = rows[:limit]
+                response.headers["X-Next-Cursor"] = str(rows[-1].id)
+            return [
+                PhotoMeta(**row._mapping, url=f"/photos/{row.id}/raw")
+                for row in rows
+            ]
+        except Exception as e:
+            logging.error(f"Произошла непредвиденная ошибка: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Произошла непредвиденная ошибка"
+            )
+            
     async def get_photo_by_id(id: int, db: AsyncSession):
         try:
+            blob = photo_cache.get(id)
+            if blob is not None:
+                return PhotoSchema(
+                    id=id,
+                    title=blob.title,
+                    filename=blob.filename,
+                    content_type=blob.content_type,
+                    data=base64.b64encode(blob.data).decode("utf-8")
+                )
+
             # Получаем фотографию из базы данных
             result = await db.execute(select(Photo).filter(Photo.id == id))
             photo = result.scalars().one_or_none()  # Получаем единственный объект или None
 
             if photo:
+                data = await read_photo_data(photo, db)
+                photo_cache.set(id, PhotoBlob(photo.title, photo.filename, photo.content_type, data))
+
                 # Преобразуем объект SQLAlchemy в Pydantic модель
                 photo_dict = photo.__dict__.copy()
                 photo_dict.pop('_sa_instance_state', None)  # Убираем служебные атрибуты SQLAlchemy
 
                 # Преобразуем бинарные данные в строку base64
-                if "data" in photo_dict:
-                    photo_dict["data"] = base64.b64encode(photo_dict["data"]).decode("utf-8")
+                photo_dict["data"] = base64.b64encode(data).decode("utf-8")
 
                 # Возвращаем Pydantic модель
                 photo_schema = PhotoSchema(**photo_dict)
@@ -113,18 +234,131 @@ class PhotoControllers:
                 detail="Произошла непредвиденная ошибка"
             )
     
-    async def update_photo(id: int, photo_update: PhotoForUpdate, db: AsyncSession):
+    async def get_photo_raw(id: int, request: Request, db: AsyncSession, variant: Optional[str] = None):
+        # Байты фото как есть, без base64: для <img src> и кеша браузера
+        if variant is not None and variant not in VARIANTS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Неизвестный вариант фото, доступны: {', '.join(VARIANTS)}"
+            )
+        headers = {
+            "ETag": f'"photo-{id}-{variant}"' if variant else f'"photo-{id}"',
+            "Cache-Control": f"public, max-age={config.photo_cache_max_age_sec}",
+            "Accept-Ranges": "bytes",
+        }
+        if is_not_modified(request, headers):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
         try:
-            # Получение существующей фотографии из базы данных
-            result = await db.execute(select(Photo).filter(Photo.id == id))
-            existing_photo = result.scalars().first()
+            blob = photo_cache.get(id) if variant is None else None
+            if blob is not None:
+                return bytes_response(request, headers, blob.content_type, blob.data)
 
-            if existing_photo:
-                # Обновление только названия
-                existing_photo.title = photo_update.title
+            # data не читается: только id строки, хранящей байты в БД (своей или с тем же хешем),
+            # NULL, если байты в файловом хранилище
+            holder = aliased(Photo)
+            shared_holder = (
+                select(holder.id)
+                .where(holder.content_hash == Photo.content_hash, holder.data.is_not(None))
+                .limit(1)
+                .scalar_subquery()
+            )
+            result = await db.execute(
+                select(
+                    Photo.title,
+                    Photo.filename,
+                    Photo.content_type,
+                    Photo.content_hash,
+                    Photo.size,
+                    case((Photo.data.is_not(None), Photo.id), else_=shared_holder).label("holder_id")
+                ).filter(Photo.id == id)
+            )
+            photo = result.one_or_none()
+            if photo is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Фото не найдено"
+                )
+            in_database = photo.holder_id is not None
+            base_path = local_storage.path(photo.content_hash)
+
+            if variant is not None:
+                path = variant_path(base_path, variant)
+                if os.path.exists(path):
+                    return FileResponse(path, media_type=VARIANT_MEDIA_TYPE, headers=headers)
+                # Варианта нет: отдаём оригинал. Для файлов на диске генерация ставится в очередь,
+                # фото из БД обрабатываются только при загрузке — публичное чтение не тянет байты в пул
+                headers["ETag"] = f'"photo-{id}"'
+                if not in_database and not has_failed(base_path):
+                    headers["Cache-Control"] = "public, max-age=60"
+                    schedule_variants(base_path, base_path)
+
+            size = photo.size if in_database else local_storage.size(photo.content_hash)
 
+            range_header = request.headers.get("range")
+            if_range = request.headers.get("if-range")
+            if range_header and (if_range is None or if_range == headers["ETag"]):
+                try:
+                    byte_range = parse_range(range_header, size)
+                except RangeNotSatisfiable:
+                    return Response(
+                        status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                        headers={**headers, "Content-Range": f"bytes */{size}"}
+                    )
+                if byte_range is not None:
+                    start, end = byte_range
+                    if in_database:
+                        # Из БД читается только запрошенный фрагмент
+                        result = await db.execute(
+                            select(func.substring(Photo.data, start + 1, end - start + 1))
+                            .filter(Photo.id == photo.holder_id)
+                        )
+                        content = result.scalar_one()
+                    else:
+                        content = await local_storage.read_range(photo.content_hash, start, end)
+                    return Response(
+                        content=content,
+                        status_code=status.HTTP_206_PARTIAL_CONTENT,
+                        media_type=photo.content_type,
+                        headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"}
+                    )
+
+            if not in_database and size > config.photo_cache_max_entry_bytes:
+                # Большой файл отдаётся потоково, минуя пул соединений с БД
+                return FileResponse(base_path, media_type=photo.content_type, headers=headers)
+
+            if in_database:
+                result = await db.execute(select(Photo.data).filter(Photo.id == photo.holder_id))
+                data = result.scalar_one()
+            else:
+                data = await local_storage.read(photo.content_hash)
+            if variant is None:
+                photo_cache.set(id, PhotoBlob(photo.title, photo.filename, photo.content_type, data))
+            return Response(content=data, media_type=photo.content_type, headers=headers)
+        except HTTPException as http_ex:
+            raise http_ex
+        except Exception as e:
+            logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Произошла непредвиденная ошибка"
+            )
+    
+    async def update_photo(id: int, photo_update: PhotoForUpdate, db: AsyncSession):
+        try:
+            # Обновление только названия одним запросом UPDATE ... RETURNING
+            result = await db.execute(
+                update(Photo)
+                .where(Photo.id == id)
+                .values(title=photo_update.title)
+                .returning(Photo.id)
+                .execution_options(synchronize_session=False)
+            )
+
+            if result.scalar_one_or_none() is not None:
                 # Сохранение изменений
                 await db.commit()
+                await photo_cache.invalidate(id)
                 return {"message": "Название фото обновлено успешно"}
             else:
                 raise HTTPException(
@@ -146,13 +380,33 @@ class PhotoControllers:
                 detail="Произошла непредвиденная ошибка"
             )
       
+    async def release_file(content_hash: Optional[str], db: AsyncSession):
+        # Файл и его варианты удаляются, только если на тот же хеш не ссылается другое фото.
+        # Ссылки проверяются под блокировкой хеша: параллельная загрузка того же содержимого
+        # либо уже зафиксировала строку, либо ещё не перенесла файл и запишет его заново
+        if content_hash is None:
+            return
+        await PhotoControllers.lock_content_hash(content_hash, db)
+        result = await db.execute(select(Photo.id).filter(Photo.content_hash == content_hash).limit(1))
+        if result.first() is None:
+            await local_storage.delete(content_hash)
+            await asyncio.to_thread(delete_variants, local_storage.path(content_hash))
+        await db.commit()
+      
     async def del_photo(id: int, db: AsyncSession):
         try:
-            result = await db.execute(select(Photo).filter(Photo.id == id))
-            photo = result.scalars().first()
-            if photo:
-                await db.delete(photo)
+            result = await db.execute(
+                delete(Photo)
+                .where(Photo.id == id)
+                .returning(Photo.content_hash)
+                .execution_options(synchronize_session=False)
+            )
+            deleted = result.first()
+            if deleted:
+                content_hash = deleted.content_hash
                 await db.commit()
+                await photo_cache.invalidate(id)
+                await PhotoControllers.release_file(content_hash, db)
                 return {"message": "Фото удалено успешно"}
             else:
                 raise HTTPException(
@@ -4,39 +4,43 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError, OperationalError
 from contextlib import asynccontextmanager
 from database import init_db, get_db
-from schemas import ProductBase
+from schemas import ProductBase, ProductPatch
 from models import Product
+from schemas import Product as ProductSchema
+from cache import catalog_cache
+from snapshot import JSONSnapshot
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import asc
-from typing import List
+from sqlalchemy import asc, delete, update
+from typing import List, Union
 import logging
 import config
 
 def validate_product_data(product):
     errors = []
 
-    if product.price_for_itm < 0:
-        errors.append("Стоимость продукта меньше 0")
-    if product.weight_for_itm < 0:
-        errors.append("Вес продукта меньше 0")
-
-    price_str = str(product.price_for_itm).replace(',', '.')
-    weight_str = str(product.weight_for_itm).replace(',', '.')
-
-    if price_str.startswith('0') and len(price_str) > 1 and price_str[1].isdigit():
-        errors.append("Стоимость продукта не может начинаться с 0 если она больше 0")
-    if weight_str.startswith('0') and len(weight_str) > 1 and weight_str[1].isdigit():
-        errors.append("Вес продукта не может начинаться с 0 если она больше 0")
-    try:
-        product.price_for_itm = float(price_str)
-    except ValueError:
-        errors.append("Стоимость продукта должна быть числом формата 0.00")
+    # При частичном обновлении (PATCH) проверяются только переданные поля
+    if product.price_for_itm is not None:
+        if product.price_for_itm < 0:
+            errors.append("Стоимость продукта меньше 0")
+        price_str = str(product.price_for_itm).replace(',', '.')
+        if price_str.startswith('0') and len(price_str) > 1 and price_str[1].isdigit():
+            errors.append("Стоимость продукта не может начинаться с 0 если она больше 0")
+        try:
+            product.price_for_itm = float(price_str)
+        except ValueError:
+            errors.append("Стоимость продукта должна быть числом формата 0.00")
 
-    try:
-        product.weight_for_itm = float(weight_str)
-    except ValueError:
-        errors.append("Вес продукта должна быть числом формата 0.00")
+    if product.weight_for_itm is not None:
+        if product.weight_for_itm < 0:
+            errors.append("Вес продукта меньше 0")
+        weight_str = str(product.weight_for_itm).replace(',', '.')
+        if weight_str.startswith('0') and len(weight_str) > 1 and weight_str[1].isdigit():
+            errors.append("Вес продукта не может начинаться с 0 если она больше 0")
+        try:
+            product.weight_for_itm = float(weight_str)
+        except ValueError:
+            errors.append("Вес продукта должна быть числом формата 0.00")
 
     if errors:
         raise HTTPException(
@@ -62,6 +66,7 @@ class ProductControllers:
             )
             db.add(new_product)
             await db.commit()
+            await catalog_cache.invalidate()
             return { "message": "Продукт добавлен успешно" }
         except IntegrityError as e:
             conflict_detail = getattr(e.orig, 'diag', {}).get('message_detail', "Продукт с таким названием уже существует")        
@@ -82,9 +87,11 @@ class ProductControllers:
     
     async def get_products(db: AsyncSession):
         try:
-            result = await db.execute(select(Product).order_by(asc(Product.id)))
-            products = result.scalars().all()
-            return products
+            async def load_products():
+                result = await db.execute(select(Product).order_by(asc(Product.id)))
+                return [ProductSchema.model_validate(product, from_attributes=True) for product in result.scalars().all()]
+
+            return await catalog_cache.get_or_load("products", load_products)
         except HTTPException as http_ex:
             raise http_ex
         except Exception as e:
@@ -94,10 +101,21 @@ class ProductControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
+    async def get_products_snapshot(db: AsyncSession):
+        async def build_snapshot():
+            products = await ProductControllers.get_products(db)
+            return JSONSnapshot([product.model_dump(mode="json") for product in products])
+
+        return await catalog_cache.get_or_load("products_snapshot", build_snapshot)
+            
     async def get_product_by_id(id: int, db: AsyncSession):
         try:
-            result = await db.execute(select(Product).filter(Product.id == id))
-            product = result.scalars().first()
+            async def load_product():
+                result = await db.execute(select(Product).filter(Product.id == id))
+                product = result.scalars().first()
+                return ProductSchema.model_validate(product, from_attributes=True) if product else None
+
+            product = await catalog_cache.get_or_load(("product", id), load_product)
             if product:
                 return product
             else:
@@ -114,28 +132,34 @@ class ProductControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
-    async def update_product(id: int, product:ProductBase, db: AsyncSession):
+    async def update_product(id: int, product: Union[ProductBase, ProductPatch], db: AsyncSession, partial: bool = False):
         try:
             validate_product_data(product)
 
-            result = await db.execute(select(Product).filter(Product.id == id))
-            existing_product = result.scalars().first()
+            # PUT обновляет все столбцы, PATCH — только переданные
+            values = product.model_dump(exclude_unset=partial)
+            if not values:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Нет полей для обновления"
+                )
 
-            if not existing_product:
+            # Один запрос UPDATE ... RETURNING: отсутствие строки означает, что продукта нет
+            result = await db.execute(
+                update(Product)
+                .where(Product.id == id)
+                .values(**values)
+                .returning(Product.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.scalar_one_or_none() is None:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Продукт не найден"
                 )
-            existing_product.title = product.title
-            existing_product.description = product.description
-            existing_product.img_URL=product.img_URL
-            existing_product.img_title=product.img_title
-            existing_product.price_for_itm = product.price_for_itm
-            existing_product.weight_for_itm = product.weight_for_itm
-            existing_product.is_active = product.is_active
-            existing_product.category_id = product.category_id
 
             await db.commit()
+            await catalog_cache.invalidate()
             return {"message": "Продукт обновлен успешно"}
 
         except IntegrityError as e:
@@ -161,11 +185,16 @@ class ProductControllers:
 
     async def del_product(id: int, db: AsyncSession):
         try:
-            result = await db.execute(select(Product).filter(Product.id == id))
-            product = result.scalars().first()
-            if product:
-                await db.delete(product)
+            # Заказы продукта удаляет ON DELETE CASCADE в БД: один запрос независимо от истории
+            result = await db.execute(
+                delete(Product)
+                .where(Product.id == id)
+                .returning(Product.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.scalar_one_or_none() is not None:
                 await db.commit()
+                await catalog_cache.invalidate()
                 return {"message": "Продукт удален успешно"}
             else:
                 raise HTTPException(
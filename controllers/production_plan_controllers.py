@@ -0,0 +1,33 @@
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import asc
+from schemas import ProductionPlanItem
+from models import Product, ProductionPlan
+from datetime import date
+import logging
+
+class ProductionPlanControllers:
+    async def get_production_plan(plan_date: date, db: AsyncSession):
+        try:
+            # Готовые итоги по первичному ключу (date, product_id): десятки строк вместо обхода заказов
+            result = await db.execute(
+                select(
+                    ProductionPlan.product_id,
+                    Product.title.label("product_title"),
+                    ProductionPlan.order_count,
+                    ProductionPlan.quantity,
+                    ProductionPlan.total_weight,
+                    ProductionPlan.total_price
+                )
+                .outerjoin(Product, Product.id == ProductionPlan.product_id)
+                .where(ProductionPlan.date == plan_date)
+                .order_by(asc(ProductionPlan.product_id))
+            )
+            return [ProductionPlanItem(**row._mapping) for row in result.all()]
+        except Exception as e:
+            logging.error(f"Произошла непредвиденная ошибка: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Произошла непредвиденная ошибка"
+            )
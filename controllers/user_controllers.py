@@ -1,4 +1,5 @@
-from fastapi import HTTPException, status, Response
+from fastapi import HTTPException, status, Request, Response
+from fastapi.security.utils import get_authorization_scheme_param
 from pydantic import BaseModel, FieldValidationInfo, field_validator, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 import re
@@ -10,12 +11,13 @@ from schemas import UserBase, UserLogin, UserRegister
 from models import User
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import asc
+from sqlalchemy import asc, delete
 from typing import List
-import bcrypt
 import logging
 import config
-from auth.access_token import create_jwt_token
+from auth.access_token import create_jwt_token, revoke_token, revoke_user, verify_jwt_token
+from auth.passwords import check_password, hash_password
+from auth.rate_limit import check_login_rate
 
 logger = logging.getLogger(__name__)
 
@@ -30,11 +32,11 @@ class UserControllers:
                     detail="Пользователь с таким именем уже существует"
                 )
 
-            hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt(5))
+            hashed_password = await hash_password(user.password)
 
             new_user = User(
                 name=user.name,
-                password=hashed_password.decode('utf-8')
+                password=hashed_password
             )
 
             db.add(new_user)
@@ -73,8 +75,11 @@ class UserControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
-    async def login(response: Response, user: UserLogin, db: AsyncSession):
+    async def login(request: Request, response: Response, user: UserLogin, db: AsyncSession):
         try:
+            # Ограничение частоты попыток до обращения к БД и bcrypt
+            check_login_rate(request, user.name)
+
             existing_user = await db.execute(select(User).filter(User.name == user.name))
             existing_user = existing_user.scalar_one_or_none()
 
@@ -86,7 +91,7 @@ class UserControllers:
                 )
             
 
-            if not bcrypt.checkpw(user.password.encode('utf-8'), existing_user.password.encode('utf-8')):
+            if not await check_password(user.password, existing_user.password):
                 logger.warning(f"Попытка войти провалена: Неверный пароль для пользователя {user.name}")
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -118,6 +123,28 @@ class UserControllers:
                 detail="Произошла непредвиденная ошибка"
             )
             
+    async def logout(request: Request, response: Response):
+        try:
+            # Токен из cookie или заголовка Authorization отзывается во всех воркерах, cookie удаляется
+            scheme, bearer = get_authorization_scheme_param(request.headers.get("Authorization"))
+            token = request.cookies.get("access_token") or (bearer if scheme.lower() == "bearer" else None)
+
+            # Отзываются только действительные токены: список отзыва не пополняется мусором
+            verified = await verify_jwt_token(token)
+            await revoke_token(token)
+
+            response.delete_cookie(key="access_token", httponly=True, secure=True, samesite="lax")
+            logger.info(f"Пользователь {verified['username']} вышел")
+            return {"message": "Выход выполнен"}
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error during logout: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Произошла непредвиденная ошибка"
+            )
+            
     async def get_users(db: AsyncSession):
         try:
             result = await db.execute(select(User).order_by(asc(User.name)))
@@ -154,11 +181,16 @@ class UserControllers:
             
     async def del_user(id: int, db: AsyncSession):
         try:
-            result = await db.execute(select(User).filter(User.id == id))
-            user = result.scalars().first()
-            if user:
-                await db.delete(user)
+            result = await db.execute(
+                delete(User)
+                .where(User.id == id)
+                .returning(User.name)
+                .execution_options(synchronize_session=False)
+            )
+            username = result.scalar_one_or_none()
+            if username is not None:
                 await db.commit()
+                await revoke_user(username)
                 return {"message": "Пользователь удален успешно"}
             else:
                 raise HTTPException(
@@ -2,6 +2,11 @@ from fastapi import FastAPI, Depends, WebSocket
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 import config
+from migrations import LATEST_VERSION, current_version
+from pubsub import pubsub
+from WebSocket.ws import manager
+from photo_variants import shutdown_executor
+from analytics import analytics_scheduler
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -31,10 +36,14 @@ SessionLocal = sessionmaker(
 # Базовый класс для моделей
 Base = declarative_base()
 
-# Инициализация базы данных
+# Проверка версии схемы БД. Сами миграции применяются один раз за деплой: python -m migrations
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    async with engine.connect() as conn:
+        version = await current_version(conn)
+    if version < LATEST_VERSION:
+        raise RuntimeError(
+            f"Схема БД устарела (версия {version}, требуется {LATEST_VERSION}). Выполните: python -m migrations"
+        )
 
 # Зависимость для получения сессии БД
 async def get_db():
@@ -48,7 +57,13 @@ async def get_db():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await pubsub.start()  # Слушатель LISTEN/NOTIFY для рассылки между воркерами
+    analytics_scheduler.start(engine)  # Пересчёт итогов аналитики по расписанию
     yield
+    await analytics_scheduler.stop()
+    await manager.stop()  # Публикация очереди WebSocket-уведомлений
+    await pubsub.stop()
+    shutdown_executor()  # Пул процессов для вариантов фото
     await engine.dispose()  # Закрытие соединений при завершении
 
 # Создание FastAPI-приложения
@@ -78,4 +93,5 @@ app.add_middleware(
     allow_credentials=True,  # ✅ Разрешаем передачу credentials (cookies, токены)
     allow_methods=["*"],  # Разрешаем все методы (GET, POST, PUT, DELETE)
     allow_headers=["*"],  # Разрешаем все заголовки
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],  # Курсор следующей страницы доступен фронтенду
 )
\ No newline at end of file
@@ -0,0 +1,132 @@
+import logging
+import time
+from datetime import date
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple, Union
+from fastapi import Depends, Request, Response
+import config
+from pubsub import pubsub
+
+logger = logging.getLogger(__name__)
+
+# Канал, в который триггеры БД публикуют новую версию таблицы после каждого изменения
+TABLE_VERSIONS_CHANNEL = "table_versions"
+
+
+class NotModified(Exception):
+    def __init__(self, headers: Dict[str, str]):
+        self.headers = headers
+
+
+class TableVersions:
+    # Версии таблиц для ETag. Триггеры БД публикуют номер из table_version_seq после каждого
+    # изменения; номера фиксируются не по порядку, поэтому версия — последний полученный номер.
+    # До первого уведомления по таблице действует снимок, прочитанный при подключении к БД
+    def __init__(self):
+        self.versions: Dict[str, Tuple[str, float]] = {}
+        self.snapshot: Optional[Tuple[str, float]] = None
+
+    async def load(self):
+        # Снимок транзакций одинаков у воркеров, подключившихся без изменений в БД между ними,
+        # и отличается для любых двух разных состояний данных
+        rows = await pubsub.fetch(
+            "SELECT md5(pg_current_snapshot()::text) AS snapshot, extract(epoch FROM now())::float8 AS loaded_at"
+        )
+        if rows:
+            # Уведомления, пропущенные без соединения, покрывает новый снимок
+            self.versions = {}
+            self.snapshot = (f"s{rows[0]['snapshot'][:16]}", rows[0]["loaded_at"])
+
+    def on_notification(self, message: dict):
+        table = message.get("table")
+        if table is None or "version" not in message:
+            return
+        self.versions[table] = (str(message["version"]), float(message.get("updated_at", time.time())))
+
+    def get(self, table: str):
+        return self.versions.get(table, self.snapshot)
+
+
+table_versions = TableVersions()
+pubsub.subscribe(TABLE_VERSIONS_CHANNEL, table_versions.on_notification)
+pubsub.on_connect(table_versions.load)
+
+
+def cache_control(public: bool) -> str:
+    if public:
+        return (
+            f"public, max-age={config.http_cache_max_age_sec}, s-maxage={config.http_cache_s_maxage_sec}, "
+            f"stale-while-revalidate={config.http_cache_stale_while_revalidate_sec}"
+        )
+    return "private, no-cache"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Сжатый снимок каталога отдаётся с суффиксом -gzip, содержимое у них одно
+    candidates = {etag, etag[:-1] + '-gzip"'}
+    return any(tag.strip().removeprefix("W/") in candidates for tag in if_none_match.split(","))
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    etag = headers.get("ETag")
+    if etag is None:
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in headers:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional(table: Union[str, Tuple[str, ...]], public: bool = False, daily: bool = False):
+    # Зависимость для GET-маршрутов: ETag/Last-Modified по версии таблицы, 304 без обращения к БД.
+    # Для ответа из нескольких таблиц передаётся кортеж: ETag меняется при изменении любой из них
+    tables = (table,) if isinstance(table, str) else tuple(table)
+
+    async def dependency(request: Request, response: Response) -> Dict[str, str]:
+        headers = {"Cache-Control": cache_control(public)}
+        versions = [table_versions.get(name) for name in tables]
+        if all(version is not None for version in versions):
+            # daily: ответ зависит от текущей даты (например, заказы начиная с сегодня)
+            suffix = f"-{date.today().isoformat()}" if daily else ""
+            tag = ".".join(f"{name}-{version[0]}" for name, version in zip(tables, versions))
+            headers["ETag"] = f'"{tag}{suffix}"'
+            headers["Last-Modified"] = formatdate(max(version[1] for version in versions), usegmt=True)
+        if is_not_modified(request, headers):
+            raise NotModified(headers)
+        response.headers.update(headers)
+        return headers
+
+    return Depends(dependency)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(range_header: str, size: int):
+    # Поддерживается один диапазон: bytes=start-end, bytes=start- и bytes=-suffix
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in ranges:
+        return None
+    start_str, _, end_str = ranges.strip().partition("-")
+    try:
+        if start_str == "":
+            suffix = int(end_str)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - suffix, 0), size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, FastAPI, Response, HTTPException, Depends, status, UploadFile, Form, File, WebSocket
+from fastapi import APIRouter, FastAPI, Response, HTTPException, Depends, Query, status, UploadFile, Form, File, WebSocket
 from pydantic import ValidationError
 
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -9,24 +9,31 @@ from fastapi import Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import init_db, get_db, app
-from schemas import User, UserBase, UserLogin, UserRegister, Client, ClientBase, Category, CategoryBase, Product, ProductBase, OrderBase, Order, PhotoBase, Photo, PhotoForUpdate
+from database import get_db, app
+from schemas import User, UserBase, UserLogin, UserRegister, Client, ClientBase, ClientPatch, ClientStats, Category, CategoryBase, CategoryPatch, Product, ProductBase, ProductPatch, OrderBase, OrderPatch, Order, PhotoBase, Photo, PhotoForUpdate, PhotoMeta, ProductionPlanItem, ProductSales, CategorySales, SalesTotals
 from models import Client as ClientModel, Category as CategoryModel, Product as ProductModel
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
-from typing import List, Optional, Union
+from typing import List, Literal, Optional, Union
 from controllers.client_controllers import ClientControllers
 from controllers.category_controllers import CategoryControllers
 from controllers.product_controllers import ProductControllers
 from controllers.order_controllers import OrderControllers
 from controllers.photo_controllers import PhotoControllers
+from controllers.production_plan_controllers import ProductionPlanControllers
+from controllers.analytics_controllers import AnalyticsControllers
 from controllers.user_controllers import UserControllers
-from WebSocket.ws import websocket_manager, manager, logger
+from WebSocket.ws import manager, logger
+from datetime import date
 import os
 import config
 import logging
 import uvicorn
-from auth.access_token import verify_jwt_token
+from auth.access_token import token_cache, verify_jwt_token
+from auth import rate_limit
+from cache import analytics_cache, catalog_cache, photo_cache
+from snapshot import snapshot_response
+from http_cache import NotModified, conditional
 
 # Создание роута
 
@@ -34,12 +41,6 @@ router = APIRouter(prefix="/api/v1")
 verify = APIRouter(dependencies=[Depends(verify_jwt_token)])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Создание таблиц если их не существует
-
-@app.on_event("startup")
-async def on_startup():
-    await init_db()
-    
 # Приветствие
 
 """ @router.get( """
@@ -90,10 +91,14 @@ async def get_categories(
     tags=["Categories"]
 )
 async def get_categories(
+    request: Request,
     # username: str = Depends(verify_jwt_token),
+    cache_headers: dict = conditional("categories", public=True),
     db: AsyncSession = Depends(get_db)
 ):
-    return await CategoryControllers.get_categories(db)
+    # Готовые байты JSON из снимка каталога, без валидации и сериализации на каждый запрос
+    snapshot = await CategoryControllers.get_categories_snapshot(db)
+    return snapshot_response(request, snapshot, cache_headers)
 
 @app.get(
     "/categories/{id}", 
@@ -102,7 +107,11 @@ async def get_categories(
     description="Получить категорию по ID",
     tags=["Categories"]
 )
-async def get_category_by_ID(id: int, db: AsyncSession = Depends(get_db)):
+async def get_category_by_ID(
+    id: int,
+    cache_headers: dict = conditional("categories", public=True),
+    db: AsyncSession = Depends(get_db)
+):
     return await CategoryControllers.get_category_by_id(id, db)
 
 @verify.put(
@@ -114,6 +123,15 @@ async def get_category_by_ID(id: int, db: AsyncSession = Depends(get_db)):
 async def update_category(id: int, category: CategoryBase, db: AsyncSession = Depends(get_db)):
     return await CategoryControllers.update_category(id, category, db)
 
+@verify.patch(
+    "/categories/{id}", 
+    status_code=status.HTTP_200_OK, 
+    description="Частично обновить категорию по ID",
+    tags=["Categories"]
+)
+async def patch_category(id: int, category: CategoryPatch, db: AsyncSession = Depends(get_db)):
+    return await CategoryControllers.update_category(id, category, db, partial=True)
+
 @verify.delete(
     "/categories/{id}", 
     status_code=status.HTTP_200_OK, 
@@ -139,8 +157,14 @@ async def add_product(product: ProductBase, db: AsyncSession = Depends(get_db)):
     description="Получить все продукты",
     tags=["Products"]
 )
-async def get_products(db: AsyncSession = Depends(get_db)):
-    return await ProductControllers.get_products(db)
+async def get_products(
+    request: Request,
+    cache_headers: dict = conditional("products", public=True),
+    db: AsyncSession = Depends(get_db)
+):
+    # Готовые байты JSON из снимка каталога, без валидации и сериализации на каждый запрос
+    snapshot = await ProductControllers.get_products_snapshot(db)
+    return snapshot_response(request, snapshot, cache_headers)
 
 @app.get(
     "/products/{id}",
@@ -149,7 +173,11 @@ async def get_products(db: AsyncSession = Depends(get_db)):
     description="Получить продукт по ID",
     tags=["Products"]
 )
-async def get_product_by_ID(id: int, db: AsyncSession = Depends(get_db)):
+async def get_product_by_ID(
+    id: int,
+    cache_headers: dict = conditional("products", public=True),
+    db: AsyncSession = Depends(get_db)
+):
     return await ProductControllers.get_product_by_id(id, db)
 
 @verify.put(
@@ -161,6 +189,15 @@ async def get_product_by_ID(id: int, db: AsyncSession = Depends(get_db)):
 async def update_product(id: int, product: ProductBase, db: AsyncSession = Depends(get_db)):
     return await ProductControllers.update_product(id, product, db)
 
+@verify.patch(
+    "/products/{id}", 
+    status_code=status.HTTP_200_OK, 
+    description="Частично обновить продукт по ID",
+    tags=["Products"]
+)
+async def patch_product(id: int, product: ProductPatch, db: AsyncSession = Depends(get_db)):
+    return await ProductControllers.update_product(id, product, db, partial=True)
+
 @verify.delete(
     "/products/{id}", 
     status_code=status.HTTP_200_OK, 
@@ -175,21 +212,32 @@ async def remove_product(id: int, db: AsyncSession = Depends(get_db)):
 @app.post(
     "/clients", 
     status_code=status.HTTP_201_CREATED, 
-    description="Добавить нового клиента",
+    description="Добавить нового клиента (201) или вернуть существующего с тем же телефоном (200)",
     tags=["Clients"]
 )
-async def add_client(client: ClientBase, db: AsyncSession = Depends(get_db)):
-    return await ClientControllers.create_client(client, db)
+async def add_client(client: ClientBase, response: Response, db: AsyncSession = Depends(get_db)):
+    return await ClientControllers.create_client(client, response, db)
 
 @verify.get(
     "/clients", 
     response_model=List[Client], 
     status_code=status.HTTP_200_OK, 
-    description="Получить всех клиентов",
+    description="Получить клиентов постранично с поиском по телефону или имени",
     tags=["Clients"]
 )
-async def get_clients(db: AsyncSession = Depends(get_db)):
-    return await ClientControllers.get_clients(db)
+async def get_clients(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500, description="Размер страницы"),
+    after: Optional[int] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    q: Optional[str] = Query(
+        None,
+        max_length=50,
+        description="Поиск: '+7916' — начало телефона, '1234' — часть телефона, иначе — часть имени"
+    ),
+    cache_headers: dict = conditional("clients"),
+    db: AsyncSession = Depends(get_db)
+):
+    return await ClientControllers.get_clients(db, response, limit, after, q)
 
 @verify.get(
     "/clients/{id}", 
@@ -198,9 +246,44 @@ async def get_clients(db: AsyncSession = Depends(get_db)):
     description="Получить клиента по ID", 
     tags=["Clients"]
 )
-async def get_client_by_ID(id: int, db: AsyncSession = Depends(get_db)):
+async def get_client_by_ID(
+    id: int,
+    cache_headers: dict = conditional("clients"),
+    db: AsyncSession = Depends(get_db)
+):
     return await ClientControllers.get_client_by_id(id, db)
 
+@verify.get(
+    "/clients/{id}/orders", 
+    response_model=List[Order], 
+    status_code=status.HTTP_200_OK, 
+    description="История заказов клиента, от новых к старым", 
+    tags=["Clients"]
+)
+async def get_client_orders(
+    id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500, description="Размер страницы"),
+    after: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    cache_headers: dict = conditional(("clients", "orders")),
+    db: AsyncSession = Depends(get_db)
+):
+    return await OrderControllers.get_client_orders(id, db, response, limit, after)
+
+@verify.get(
+    "/clients/{id}/stats", 
+    response_model=ClientStats, 
+    status_code=status.HTTP_200_OK, 
+    description="Сводка по клиенту: число заказов, сумма, дата последнего заказа", 
+    tags=["Clients"]
+)
+async def get_client_stats(
+    id: int,
+    cache_headers: dict = conditional(("clients", "orders")),
+    db: AsyncSession = Depends(get_db)
+):
+    return await ClientControllers.get_client_stats(id, db)
+
 @app.put(
     "/clients/{id}", 
     status_code=status.HTTP_200_OK, 
@@ -210,6 +293,15 @@ async def get_client_by_ID(id: int, db: AsyncSession = Depends(get_db)):
 async def update_client(id: int, client: ClientBase, db: AsyncSession = Depends(get_db)):
     return await ClientControllers.update_client(id, client, db)
 
+@app.patch(
+    "/clients/{id}", 
+    status_code=status.HTTP_200_OK, 
+    description="Частично обновить информацию клиента по ID", 
+    tags=["Clients"]
+)
+async def patch_client(id: int, client: ClientPatch, db: AsyncSession = Depends(get_db)):
+    return await ClientControllers.update_client(id, client, db, partial=True)
+
 @app.delete(
     "/clients/{id}", 
     status_code=status.HTTP_200_OK, 
@@ -237,8 +329,37 @@ async def add_order(order: Union[OrderBase, List[OrderBase]], db: AsyncSession =
     description="Получить все заказы",
      tags=["Orders"]
 )
-async def get_orders(db: AsyncSession = Depends(get_db)):
-    return await OrderControllers.get_orders(db)
+async def get_orders(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500, description="Размер страницы"),
+    after: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    date_from: Optional[date] = Query(None, description="Дата заказа от (по умолчанию сегодня)"),
+    date_to: Optional[date] = Query(None, description="Дата заказа до"),
+    is_active: Optional[bool] = None,
+    product_id: Optional[int] = None,
+    client_phone: Optional[str] = None,
+    cache_headers: dict = conditional("orders", daily=True),
+    db: AsyncSession = Depends(get_db)
+):
+    return await OrderControllers.get_orders(
+        db, response, limit, after, date_from, date_to, is_active, product_id, client_phone
+    )
+
+# Объявлен до /orders/{id}, иначе "export" попадёт в параметр id
+@verify.get(
+    "/orders/export", 
+    status_code=status.HTTP_200_OK, 
+    description="Выгрузить заказы в CSV или NDJSON потоком",
+    tags=["Orders"]
+)
+async def export_orders(
+    format: Literal["csv", "ndjson"] = Query("csv", description="Формат выгрузки"),
+    date_from: Optional[date] = Query(None, description="Дата заказа от"),
+    date_to: Optional[date] = Query(None, description="Дата заказа до"),
+    is_active: Optional[bool] = None,
+    product_id: Optional[int] = None
+):
+    return OrderControllers.export_orders(format, date_from, date_to, is_active, product_id)
 
 
 @verify.get(
@@ -248,7 +369,11 @@ async def get_orders(db: AsyncSession = Depends(get_db)):
     description="Получить заказ по ID",
     tags=["Orders"]
 )
-async def get_order_by_ID(id: int, db: AsyncSession = Depends(get_db)):
+async def get_order_by_ID(
+    id: int,
+    cache_headers: dict = conditional("orders"),
+    db: AsyncSession = Depends(get_db)
+):
     return await OrderControllers.get_order_by_id(id, db)
 
 @verify.put(
@@ -260,6 +385,15 @@ async def get_order_by_ID(id: int, db: AsyncSession = Depends(get_db)):
 async def update_order(id: int, order: OrderBase, db: AsyncSession = Depends(get_db)):
     return await OrderControllers.update_order(id, order, db)
 
+@verify.patch(
+    "/orders/{id}", 
+    status_code=status.HTTP_200_OK, 
+    description="Частично обновить заказ по ID",
+    tags=["Orders"]
+)
+async def patch_order(id: int, order: OrderPatch, db: AsyncSession = Depends(get_db)):
+    return await OrderControllers.update_order(id, order, db, partial=True)
+
 @verify.delete(
     "/orders/{id}", 
     status_code=status.HTTP_200_OK, 
@@ -269,6 +403,72 @@ async def update_order(id: int, order: OrderBase, db: AsyncSession = Depends(get
 async def remove_order(id: int, db: AsyncSession = Depends(get_db)):
     return await OrderControllers.del_order(id, db)
 
+# План производства
+
+@verify.get(
+    "/production-plan",
+    response_model=List[ProductionPlanItem],
+    status_code=status.HTTP_200_OK,
+    description="Итоги заказов на дату по продуктам: количество, вес и сумма",
+    tags=["Production"]
+)
+async def get_production_plan(
+    plan_date: Optional[date] = Query(None, alias="date", description="Дата заказов (по умолчанию сегодня)"),
+    cache_headers: dict = conditional(("orders", "products"), daily=True),
+    db: AsyncSession = Depends(get_db)
+):
+    return await ProductionPlanControllers.get_production_plan(plan_date or date.today(), db)
+
+# Аналитика
+
+@verify.get(
+    "/analytics/products",
+    response_model=List[ProductSales],
+    status_code=status.HTTP_200_OK,
+    description="Выручка, количество и вес по продуктам за недели или месяцы",
+    tags=["Analytics"]
+)
+async def get_product_sales(
+    period: Literal["week", "month"] = Query("month", description="Период итогов"),
+    date_from: Optional[date] = Query(None, description="Дата начала (по умолчанию год назад)"),
+    date_to: Optional[date] = Query(None, description="Дата окончания"),
+    cache_headers: dict = conditional(("sales_rollup", "products"), daily=True),
+    db: AsyncSession = Depends(get_db)
+):
+    return await AnalyticsControllers.get_product_sales(period, date_from, date_to, db)
+
+@verify.get(
+    "/analytics/categories",
+    response_model=List[CategorySales],
+    status_code=status.HTTP_200_OK,
+    description="Выручка, количество и вес по категориям за недели или месяцы",
+    tags=["Analytics"]
+)
+async def get_category_sales(
+    period: Literal["week", "month"] = Query("month", description="Период итогов"),
+    date_from: Optional[date] = Query(None, description="Дата начала (по умолчанию год назад)"),
+    date_to: Optional[date] = Query(None, description="Дата окончания"),
+    cache_headers: dict = conditional(("sales_rollup", "categories"), daily=True),
+    db: AsyncSession = Depends(get_db)
+):
+    return await AnalyticsControllers.get_category_sales(period, date_from, date_to, db)
+
+@verify.get(
+    "/analytics/totals",
+    response_model=List[SalesTotals],
+    status_code=status.HTTP_200_OK,
+    description="Общие итоги продаж за недели или месяцы",
+    tags=["Analytics"]
+)
+async def get_sales_totals(
+    period: Literal["week", "month"] = Query("month", description="Период итогов"),
+    date_from: Optional[date] = Query(None, description="Дата начала (по умолчанию год назад)"),
+    date_to: Optional[date] = Query(None, description="Дата окончания"),
+    cache_headers: dict = conditional("sales_rollup", daily=True),
+    db: AsyncSession = Depends(get_db)
+):
+    return await AnalyticsControllers.get_totals(period, date_from, date_to, db)
+
 # Фотографии
 
 @verify.post(
@@ -291,9 +491,28 @@ async def upload_file(
     description="Получить все фото",
     tags=["Photos"]
 )
-async def get_photos(db: AsyncSession = Depends(get_db)):
+async def get_photos(
+    cache_headers: dict = conditional("photos"),
+    db: AsyncSession = Depends(get_db)
+):
     return await PhotoControllers.get_photos(db)
 
+@verify.get(
+    "/photos/meta",
+    response_model=List[PhotoMeta],
+    status_code=status.HTTP_200_OK,
+    description="Получить список фото без бинарных данных",
+    tags=["Photos"]
+)
+async def get_photos_meta(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500, description="Размер страницы"),
+    after: Optional[int] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    cache_headers: dict = conditional("photos"),
+    db: AsyncSession = Depends(get_db)
+):
+    return await PhotoControllers.get_photos_meta(db, response, limit, after)
+
 @verify.get(
     "/photos/{id}", 
     response_model=Photo, 
@@ -301,9 +520,27 @@ async def get_photos(db: AsyncSession = Depends(get_db)):
     description="Получить фото по ID",
     tags=["Photos"]
 )
-async def get_photo_by_ID(id: int, db: AsyncSession = Depends(get_db)):
+async def get_photo_by_ID(
+    id: int,
+    cache_headers: dict = conditional("photos"),
+    db: AsyncSession = Depends(get_db)
+):
     return await PhotoControllers.get_photo_by_id(id, db)
 
+@app.get(
+    "/photos/{id}/raw",
+    status_code=status.HTTP_200_OK,
+    description="Получить файл фото по ID (бинарные данные, поддерживается Range)",
+    tags=["Photos"]
+)
+async def get_photo_raw(
+    id: int,
+    request: Request,
+    variant: Optional[str] = Query(None, description="Вариант фото: w320, w640, w1280 или placeholder"),
+    db: AsyncSession = Depends(get_db)
+):
+    return await PhotoControllers.get_photo_raw(id, request, db, variant)
+
 @verify.put(
     "/photos/{id}",
     status_code=status.HTTP_200_OK, 
@@ -347,11 +584,21 @@ async def create_user(
     tags=["Access"]
 )
 async def login(
+    request: Request,
     response: Response, 
     user: UserLogin, 
     db: AsyncSession = Depends(get_db)
 ):
-    return await UserControllers.login(response, user, db)
+    return await UserControllers.login(request, response, user, db)
+
+@app.post(
+    "/logout",
+    status_code=status.HTTP_200_OK,
+    description="Выйти из системы: токен отзывается",
+    tags=["Access"]
+)
+async def logout(request: Request, response: Response):
+    return await UserControllers.logout(request, response)
 
 
 """ @app.get(
@@ -377,7 +624,7 @@ async def validate_token(request: Request, token: str = Depends(oauth2_scheme)):
     final_token = token_from_cookie or token  # Берём токен из cookies или Authorization
     if not final_token:
         raise HTTPException(status_code=401, detail="Токен отсутствует")
-    username = verify_jwt_token(final_token)
+    username = await verify_jwt_token(final_token)
     return {"valid": True, "username": username}
 
 
@@ -396,7 +643,10 @@ async def protected_route(username: str = Depends(verify_jwt_token)):
     description="Получить всех пользователей",
     tags=["Access"]
 )
-async def get_users(db: AsyncSession = Depends(get_db)):   
+async def get_users(
+    cache_headers: dict = conditional("users"),
+    db: AsyncSession = Depends(get_db)
+):   
     return await UserControllers.get_users(db)
 
 @verify.get(
@@ -408,6 +658,7 @@ async def get_users(db: AsyncSession = Depends(get_db)):
 )
 async def get_user_by_ID(
     id: int, 
+    cache_headers: dict = conditional("users"),
     db: AsyncSession = Depends(get_db)
 ):   
     return await UserControllers.get_user_by_id(id, db)
@@ -445,6 +696,22 @@ async def websocket_endpoint(websocket: WebSocket):
     finally:
         manager.disconnect(websocket)
 
+@verify.get(
+    "/metrics",
+    status_code=status.HTTP_200_OK,
+    description="Метрики сервера",
+    tags=["Default"]
+)
+async def get_metrics():
+    return {
+        "websocket": manager.get_metrics(),
+        "catalog_cache": catalog_cache.get_metrics(),
+        "photo_cache": photo_cache.get_metrics(),
+        "login_rate_limit": rate_limit.get_metrics(),
+        "token_cache": token_cache.get_metrics(),
+        "analytics_cache": analytics_cache.get_metrics(),
+    }
+
 @app.post("/send-notification")
 async def send_notification(message: str):
     await manager.broadcast({"message": message})
@@ -530,9 +797,14 @@ async def custom_http_exception_handler(request: Request, exc: HTTPException):
     # Возвращаем стандартный обработчик для других ошибок
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=exc.headers
     )
 
+@app.exception_handler(NotModified)
+async def handle_not_modified(request: Request, exc: NotModified):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=exc.headers)
+
 @app.exception_handler(UniqueViolationError)
 async def handle_unique_violation_error(request, exc: UniqueViolationError):
     return JSONResponse(
@@ -0,0 +1,74 @@
+import importlib
+import logging
+import pkgutil
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки: миграции одного деплоя не выполняются параллельно
+MIGRATIONS_LOCK_KEY = 2010020250
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    description VARCHAR NOT NULL,
+    applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now()
+)
+"""
+
+# Файлы миграций: migrations/vNNNN_<название>.py с полями VERSION, DESCRIPTION и STATEMENTS
+def load_migrations():
+    migrations = []
+    for module_info in pkgutil.iter_modules(__path__):
+        if module_info.name.startswith("v"):
+            migrations.append(importlib.import_module(f"{__name__}.{module_info.name}"))
+    migrations.sort(key=lambda migration: migration.VERSION)
+    return migrations
+
+MIGRATIONS = load_migrations()
+LATEST_VERSION = MIGRATIONS[-1].VERSION if MIGRATIONS else 0
+
+
+async def current_version(conn) -> int:
+    try:
+        result = await conn.execute(text("SELECT coalesce(max(version), 0) FROM schema_migrations"))
+        return result.scalar()
+    except DBAPIError:
+        # Таблицы миграций ещё нет — схема не инициализирована
+        await conn.rollback()
+        return 0
+
+
+async def upgrade(engine):
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        await conn.commit()
+        try:
+            await conn.exec_driver_sql(CREATE_MIGRATIONS_TABLE)
+            result = await conn.execute(text("SELECT version FROM schema_migrations"))
+            applied = set(result.scalars().all())
+            await conn.commit()
+
+            for migration in MIGRATIONS:
+                if migration.VERSION in applied:
+                    continue
+                logger.info(f"Применение миграции {migration.VERSION}: {migration.DESCRIPTION}")
+                try:
+                    # Каждая миграция выполняется в своей транзакции вместе с записью о версии
+                    for statement in migration.STATEMENTS:
+                        await conn.exec_driver_sql(statement)
+                    await conn.execute(
+                        text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                        {"version": migration.VERSION, "description": migration.DESCRIPTION}
+                    )
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    logger.error(f"Миграция {migration.VERSION} не применена")
+                    raise
+
+            return await current_version(conn)
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+            await conn.commit()
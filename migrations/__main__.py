@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+import logging
+from database import engine
+from migrations import LATEST_VERSION, current_version, upgrade
+
+logger = logging.getLogger("migrations")
+
+
+async def main(command: str):
+    try:
+        if command == "upgrade":
+            version = await upgrade(engine)
+            logger.info(f"Схема БД обновлена до версии {version}")
+        elif command == "current":
+            async with engine.connect() as conn:
+                version = await current_version(conn)
+            print(f"Текущая версия схемы: {version}, последняя: {LATEST_VERSION}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(prog="python -m migrations", description="Миграции схемы БД")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "current"])
+    args = parser.parse_args()
+    asyncio.run(main(args.command))
@@ -0,0 +1,73 @@
+VERSION = 1
+DESCRIPTION = "Исходная схема (как создавалась через create_all)"
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS clients (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR NOT NULL,
+        phone VARCHAR NOT NULL UNIQUE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_clients_id ON clients (id)",
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        id SERIAL PRIMARY KEY,
+        title VARCHAR NOT NULL UNIQUE,
+        description VARCHAR,
+        "img_URL" VARCHAR,
+        img_title VARCHAR
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_categories_id ON categories (id)",
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        id SERIAL PRIMARY KEY,
+        title VARCHAR NOT NULL UNIQUE,
+        description VARCHAR,
+        "img_URL" VARCHAR,
+        img_title VARCHAR,
+        price_for_itm NUMERIC(10, 2),
+        weight_for_itm NUMERIC(10, 2),
+        is_active BOOLEAN,
+        category_id INTEGER REFERENCES categories (id) ON DELETE SET NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_id ON products (id)",
+    """
+    CREATE TABLE IF NOT EXISTS orders (
+        id SERIAL PRIMARY KEY,
+        client_phone VARCHAR NOT NULL,
+        client_name VARCHAR NOT NULL,
+        product_id INTEGER NOT NULL REFERENCES products (id),
+        quantity INTEGER NOT NULL,
+        total_price NUMERIC(10, 2) NOT NULL,
+        total_weight NUMERIC(10, 2) NOT NULL,
+        adres VARCHAR NOT NULL,
+        comment VARCHAR,
+        is_active BOOLEAN,
+        date DATE NOT NULL,
+        created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+        updated_at TIMESTAMP WITHOUT TIME ZONE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_orders_id ON orders (id)",
+    """
+    CREATE TABLE IF NOT EXISTS photos (
+        id SERIAL PRIMARY KEY,
+        title VARCHAR NOT NULL UNIQUE,
+        filename VARCHAR NOT NULL,
+        content_type VARCHAR NOT NULL,
+        data BYTEA NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_photos_id ON photos (id)",
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR NOT NULL UNIQUE,
+        password VARCHAR NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+]
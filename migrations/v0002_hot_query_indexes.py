@@ -0,0 +1,10 @@
+VERSION = 2
+DESCRIPTION = "Индексы для пагинации и фильтров заказов, products.category_id"
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_orders_date_id ON orders (date, id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_is_active_date_id ON orders (is_active, date, id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_product_id_date_id ON orders (product_id, date, id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_client_phone_date_id ON orders (client_phone, date, id)",
+    "CREATE INDEX IF NOT EXISTS ix_products_category_id ON products (category_id)",
+]
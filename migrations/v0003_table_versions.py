@@ -0,0 +1,46 @@
+VERSION = 3
+DESCRIPTION = "Версии таблиц для ETag: table_versions и триггеры с NOTIFY"
+
+TABLES = ["clients", "categories", "products", "orders", "photos", "users"]
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name VARCHAR PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 1,
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+    )
+    """,
+    "INSERT INTO table_versions (table_name) VALUES "
+    + ", ".join(f"('{table}')" for table in TABLES)
+    + " ON CONFLICT (table_name) DO NOTHING",
+    """
+    CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+    DECLARE
+        new_version BIGINT;
+        new_updated_at TIMESTAMP WITH TIME ZONE;
+    BEGIN
+        INSERT INTO table_versions AS tv (table_name) VALUES (TG_TABLE_NAME)
+        ON CONFLICT (table_name) DO UPDATE SET version = tv.version + 1, updated_at = now()
+        RETURNING version, updated_at INTO new_version, new_updated_at;
+
+        PERFORM pg_notify('table_versions', json_build_object(
+            'table', TG_TABLE_NAME,
+            'version', new_version,
+            'updated_at', extract(epoch FROM new_updated_at)
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+for table in TABLES:
+    STATEMENTS += [
+        f"DROP TRIGGER IF EXISTS {table}_bump_version ON {table}",
+        f"""
+        CREATE TRIGGER {table}_bump_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """,
+    ]
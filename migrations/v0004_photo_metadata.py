@@ -0,0 +1,13 @@
+VERSION = 4
+DESCRIPTION = "Размер и SHA-256 фото для списка без бинарных данных"
+
+STATEMENTS = [
+    "ALTER TABLE photos ADD COLUMN IF NOT EXISTS size INTEGER",
+    "ALTER TABLE photos ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    """
+    UPDATE photos
+    SET size = octet_length(data), content_hash = encode(sha256(data), 'hex')
+    WHERE content_hash IS NULL
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_photos_content_hash ON photos (content_hash)",
+]
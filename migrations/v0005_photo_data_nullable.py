@@ -0,0 +1,6 @@
+VERSION = 5
+DESCRIPTION = "photos.data может быть пустым: байты лежат в файловом хранилище"
+
+STATEMENTS = [
+    "ALTER TABLE photos ALTER COLUMN data DROP NOT NULL",
+]
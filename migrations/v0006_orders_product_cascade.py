@@ -0,0 +1,14 @@
+VERSION = 6
+DESCRIPTION = "orders.product_id: ON DELETE CASCADE на стороне БД"
+
+# Заказы удаляются вместе с продуктом самой БД одним DELETE. Индекс
+# ix_orders_product_id_date_id (v0002) начинается с product_id и покрывает
+# поиск строк заказов при каскаде.
+STATEMENTS = [
+    "ALTER TABLE orders DROP CONSTRAINT IF EXISTS orders_product_id_fkey",
+    """
+    ALTER TABLE orders
+        ADD CONSTRAINT orders_product_id_fkey
+        FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+    """,
+]
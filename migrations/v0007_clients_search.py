@@ -0,0 +1,12 @@
+VERSION = 7
+DESCRIPTION = "Индексы поиска клиентов: префикс телефона, подстрока телефона и имени (pg_trgm)"
+
+# CREATE EXTENSION требует прав владельца БД (или доверенного расширения в PostgreSQL 13+)
+STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # LIKE '+7916%' по индексу при любой локали БД
+    "CREATE INDEX IF NOT EXISTS ix_clients_phone_pattern ON clients (phone text_pattern_ops)",
+    # LIKE '%1234%' и ILIKE '%анна%' по триграммам
+    "CREATE INDEX IF NOT EXISTS ix_clients_phone_trgm ON clients USING gin (phone gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_clients_name_trgm ON clients USING gin (name gin_trgm_ops)",
+]
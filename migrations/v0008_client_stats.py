@@ -0,0 +1,108 @@
+VERSION = 8
+DESCRIPTION = "Сводка по клиентам client_stats, обновляемая триггерами на orders"
+
+# Заказы связаны с клиентом только через orders.client_phone, поэтому сводка ведётся
+# по телефону. Триггеры уровня оператора с таблицами переходов обрабатывают пакетную
+# вставку одним UPDATE/INSERT на оператор, а не на каждую строку. Каскадное удаление
+# заказов вместе с продуктом (v0006) тоже проходит через эти триггеры.
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS client_stats (
+        client_phone VARCHAR PRIMARY KEY,
+        order_count BIGINT NOT NULL DEFAULT 0,
+        total_spent NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        last_order_date DATE,
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE OR REPLACE FUNCTION orders_client_stats() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE client_stats AS cs
+            SET order_count = cs.order_count - old_totals.order_count,
+                total_spent = cs.total_spent - old_totals.total_spent,
+                updated_at = now()
+            FROM (
+                SELECT client_phone, count(*) AS order_count, coalesce(sum(total_price), 0) AS total_spent
+                FROM old_rows
+                GROUP BY client_phone
+            ) AS old_totals
+            WHERE cs.client_phone = old_totals.client_phone;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO client_stats AS cs (client_phone, order_count, total_spent, last_order_date)
+            SELECT client_phone, count(*), coalesce(sum(total_price), 0), max(date)
+            FROM new_rows
+            GROUP BY client_phone
+            ON CONFLICT (client_phone) DO UPDATE
+            SET order_count = cs.order_count + EXCLUDED.order_count,
+                total_spent = cs.total_spent + EXCLUDED.total_spent,
+                last_order_date = greatest(cs.last_order_date, EXCLUDED.last_order_date),
+                updated_at = now();
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            -- Удалённая или изменённая строка могла быть последним заказом: дата
+            -- пересчитывается по индексу ix_orders_client_phone_date_id
+            UPDATE client_stats AS cs
+            SET last_order_date = (SELECT max(o.date) FROM orders AS o WHERE o.client_phone = cs.client_phone)
+            WHERE cs.client_phone IN (SELECT client_phone FROM old_rows);
+
+            DELETE FROM client_stats
+            WHERE order_count <= 0 AND client_phone IN (SELECT client_phone FROM old_rows);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION orders_client_stats_truncate() RETURNS trigger AS $$
+    BEGIN
+        TRUNCATE client_stats;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Таблицы переходов допустимы только у триггера с одним событием
+    "DROP TRIGGER IF EXISTS orders_client_stats_insert ON orders",
+    """
+    CREATE TRIGGER orders_client_stats_insert
+    AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_client_stats()
+    """,
+    "DROP TRIGGER IF EXISTS orders_client_stats_update ON orders",
+    """
+    CREATE TRIGGER orders_client_stats_update
+    AFTER UPDATE ON orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_client_stats()
+    """,
+    "DROP TRIGGER IF EXISTS orders_client_stats_delete ON orders",
+    """
+    CREATE TRIGGER orders_client_stats_delete
+    AFTER DELETE ON orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_client_stats()
+    """,
+    "DROP TRIGGER IF EXISTS orders_client_stats_truncate ON orders",
+    """
+    CREATE TRIGGER orders_client_stats_truncate
+    AFTER TRUNCATE ON orders
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_client_stats_truncate()
+    """,
+    # Начальное заполнение по уже существующим заказам
+    """
+    INSERT INTO client_stats (client_phone, order_count, total_spent, last_order_date)
+    SELECT client_phone, count(*), coalesce(sum(total_price), 0), max(date)
+    FROM orders
+    GROUP BY client_phone
+    ON CONFLICT (client_phone) DO UPDATE
+    SET order_count = EXCLUDED.order_count,
+        total_spent = EXCLUDED.total_spent,
+        last_order_date = EXCLUDED.last_order_date,
+        updated_at = now()
+    """,
+]
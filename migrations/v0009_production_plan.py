@@ -0,0 +1,111 @@
+VERSION = 9
+DESCRIPTION = "План производства production_plan (date, product_id), обновляемый триггерами на orders"
+
+# Итоги по (дата, продукт) меняются в той же транзакции, что и заказы: триггеры
+# уровня оператора с таблицами переходов, как у client_stats (v0008).
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS production_plan (
+        date DATE NOT NULL,
+        product_id INTEGER NOT NULL,
+        order_count BIGINT NOT NULL DEFAULT 0,
+        quantity BIGINT NOT NULL DEFAULT 0,
+        total_weight NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        total_price NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        PRIMARY KEY (date, product_id)
+    )
+    """,
+    """
+    CREATE OR REPLACE FUNCTION orders_production_plan() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE production_plan AS pp
+            SET order_count = pp.order_count - old_totals.order_count,
+                quantity = pp.quantity - old_totals.quantity,
+                total_weight = pp.total_weight - old_totals.total_weight,
+                total_price = pp.total_price - old_totals.total_price,
+                updated_at = now()
+            FROM (
+                SELECT date, product_id, count(*) AS order_count,
+                       coalesce(sum(quantity), 0) AS quantity,
+                       coalesce(sum(total_weight), 0) AS total_weight,
+                       coalesce(sum(total_price), 0) AS total_price
+                FROM old_rows
+                GROUP BY date, product_id
+            ) AS old_totals
+            WHERE pp.date = old_totals.date AND pp.product_id = old_totals.product_id;
+
+            DELETE FROM production_plan AS pp
+            USING (SELECT DISTINCT date, product_id FROM old_rows) AS old_keys
+            WHERE pp.date = old_keys.date AND pp.product_id = old_keys.product_id
+              AND pp.order_count <= 0;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO production_plan AS pp (date, product_id, order_count, quantity, total_weight, total_price)
+            SELECT date, product_id, count(*), coalesce(sum(quantity), 0),
+                   coalesce(sum(total_weight), 0), coalesce(sum(total_price), 0)
+            FROM new_rows
+            GROUP BY date, product_id
+            ON CONFLICT (date, product_id) DO UPDATE
+            SET order_count = pp.order_count + EXCLUDED.order_count,
+                quantity = pp.quantity + EXCLUDED.quantity,
+                total_weight = pp.total_weight + EXCLUDED.total_weight,
+                total_price = pp.total_price + EXCLUDED.total_price,
+                updated_at = now();
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION orders_production_plan_truncate() RETURNS trigger AS $$
+    BEGIN
+        TRUNCATE production_plan;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS orders_production_plan_insert ON orders",
+    """
+    CREATE TRIGGER orders_production_plan_insert
+    AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_production_plan()
+    """,
+    "DROP TRIGGER IF EXISTS orders_production_plan_update ON orders",
+    """
+    CREATE TRIGGER orders_production_plan_update
+    AFTER UPDATE ON orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_production_plan()
+    """,
+    "DROP TRIGGER IF EXISTS orders_production_plan_delete ON orders",
+    """
+    CREATE TRIGGER orders_production_plan_delete
+    AFTER DELETE ON orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_production_plan()
+    """,
+    "DROP TRIGGER IF EXISTS orders_production_plan_truncate ON orders",
+    """
+    CREATE TRIGGER orders_production_plan_truncate
+    AFTER TRUNCATE ON orders
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_production_plan_truncate()
+    """,
+    # Начальное заполнение по уже существующим заказам
+    """
+    INSERT INTO production_plan (date, product_id, order_count, quantity, total_weight, total_price)
+    SELECT date, product_id, count(*), coalesce(sum(quantity), 0),
+           coalesce(sum(total_weight), 0), coalesce(sum(total_price), 0)
+    FROM orders
+    GROUP BY date, product_id
+    ON CONFLICT (date, product_id) DO UPDATE
+    SET order_count = EXCLUDED.order_count,
+        quantity = EXCLUDED.quantity,
+        total_weight = EXCLUDED.total_weight,
+        total_price = EXCLUDED.total_price,
+        updated_at = now()
+    """,
+]
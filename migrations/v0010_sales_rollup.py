@@ -0,0 +1,29 @@
+VERSION = 10
+DESCRIPTION = "Недельные и месячные итоги продаж sales_rollup для аналитики"
+
+# Таблицу заполняет analytics.py по расписанию и командой python -m analytics rebuild.
+# Версия таблицы для ETag ведётся тем же триггером, что и у остальных (v0003).
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS sales_rollup (
+        period VARCHAR(5) NOT NULL,
+        period_start DATE NOT NULL,
+        product_id INTEGER NOT NULL,
+        category_id INTEGER,
+        order_count BIGINT NOT NULL DEFAULT 0,
+        quantity BIGINT NOT NULL DEFAULT 0,
+        total_weight NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        total_price NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        PRIMARY KEY (period, period_start, product_id),
+        CHECK (period IN ('week', 'month'))
+    )
+    """,
+    "INSERT INTO table_versions (table_name) VALUES ('sales_rollup') ON CONFLICT (table_name) DO NOTHING",
+    "DROP TRIGGER IF EXISTS sales_rollup_bump_version ON sales_rollup",
+    """
+    CREATE TRIGGER sales_rollup_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON sales_rollup
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+    """,
+]
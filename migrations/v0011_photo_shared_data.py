@@ -0,0 +1,33 @@
+VERSION = 11
+DESCRIPTION = "Общие байты фото с одинаковым content_hash: при удалении хранителя байты переходят другой строке"
+
+# При хранении в БД повторная загрузка того же содержимого создаёт строку с data = NULL,
+# байты читаются из строки-хранителя с тем же content_hash. Если удаляется последний
+# хранитель, а строки с тем же хешем остаются, байты переносятся в старейшую из них.
+STATEMENTS = [
+    """
+    CREATE OR REPLACE FUNCTION photos_hand_over_data() RETURNS trigger AS $$
+    BEGIN
+        UPDATE photos AS p
+        SET data = orphaned.data
+        FROM (
+            SELECT DISTINCT ON (o.content_hash) o.content_hash, o.data
+            FROM old_rows AS o
+            WHERE o.data IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM photos AS h WHERE h.content_hash = o.content_hash AND h.data IS NOT NULL
+              )
+        ) AS orphaned
+        WHERE p.id = (SELECT min(s.id) FROM photos AS s WHERE s.content_hash = orphaned.content_hash);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS photos_hand_over_data ON photos",
+    """
+    CREATE TRIGGER photos_hand_over_data
+    AFTER DELETE ON photos
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION photos_hand_over_data()
+    """,
+]
@@ -0,0 +1,79 @@
+VERSION = 12
+DESCRIPTION = "Версии таблиц из последовательности table_version_seq вместо строк table_versions"
+
+# Строка table_versions на таблицу блокировалась каждым изменением до COMMIT и выстраивала
+# всех писателей таблицы в очередь. nextval не транзакционен и ничего не блокирует, поэтому
+# версия берётся из общей последовательности и сразу уходит в NOTIFY. Номера могут
+# фиксироваться не по порядку, поэтому воркеры считают версией последнее полученное значение,
+# а не максимальное. Операторы, не изменившие ни одной строки, версию не меняют: для этого
+# нужны таблицы переходов, а значит, отдельный триггер на каждое событие.
+TABLES = ["clients", "categories", "products", "orders", "photos", "users", "sales_rollup"]
+
+STATEMENTS = [
+    "CREATE SEQUENCE IF NOT EXISTS table_version_seq",
+    # Новые номера не должны совпасть с версиями, которые клиенты уже получили в ETag
+    """
+    SELECT setval('table_version_seq', greatest(
+        (SELECT coalesce(max(version), 0) FROM table_versions) + 1,
+        (SELECT last_value FROM table_version_seq)
+    ))
+    """,
+    """
+    CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            IF NOT EXISTS (SELECT 1 FROM new_rows) THEN
+                RETURN NULL;
+            END IF;
+        ELSIF TG_OP IN ('UPDATE', 'DELETE') THEN
+            IF NOT EXISTS (SELECT 1 FROM old_rows) THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+
+        PERFORM pg_notify('table_versions', json_build_object(
+            'table', TG_TABLE_NAME,
+            'version', nextval('table_version_seq'),
+            'updated_at', extract(epoch FROM clock_timestamp())
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+for table in TABLES:
+    STATEMENTS += [
+        f"DROP TRIGGER IF EXISTS {table}_bump_version ON {table}",
+        f"DROP TRIGGER IF EXISTS {table}_bump_version_insert ON {table}",
+        f"""
+        CREATE TRIGGER {table}_bump_version_insert
+        AFTER INSERT ON {table}
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """,
+        f"DROP TRIGGER IF EXISTS {table}_bump_version_update ON {table}",
+        f"""
+        CREATE TRIGGER {table}_bump_version_update
+        AFTER UPDATE ON {table}
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """,
+        f"DROP TRIGGER IF EXISTS {table}_bump_version_delete ON {table}",
+        f"""
+        CREATE TRIGGER {table}_bump_version_delete
+        AFTER DELETE ON {table}
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """,
+        f"DROP TRIGGER IF EXISTS {table}_bump_version_truncate ON {table}",
+        f"""
+        CREATE TRIGGER {table}_bump_version_truncate
+        AFTER TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """,
+    ]
+
+STATEMENTS += [
+    "DROP TABLE IF EXISTS table_versions",
+]
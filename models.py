@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, ForeignKey, Date, DateTime, LargeBinary
+from sqlalchemy import Column, BigInteger, Integer, String, Numeric, Boolean, ForeignKey, Date, DateTime, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -14,6 +14,24 @@ class Client(Base):
     # Связь с заказами
     """ orders = relationship("Order", back_populates="client", cascade="all, delete") """
 
+    # Индексы поиска GET /clients?q=: префикс телефона и подстроки (pg_trgm)
+    __table_args__ = (
+        Index("ix_clients_phone_pattern", "phone", postgresql_ops={"phone": "text_pattern_ops"}),
+        Index("ix_clients_phone_trgm", "phone", postgresql_using="gin", postgresql_ops={"phone": "gin_trgm_ops"}),
+        Index("ix_clients_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
+
+
+# Сводка по клиенту: ведётся триггерами на orders (миграция v0008), приложение только читает
+class ClientStats(Base):
+    __tablename__ = "client_stats"
+
+    client_phone = Column(String, primary_key=True)
+    order_count = Column(BigInteger, nullable=False, default=0)
+    total_spent = Column(Numeric(14, 2), nullable=False, default=0)
+    last_order_date = Column(Date)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
 
 # Модель заказа
 class Order(Base):
@@ -23,7 +41,7 @@ class Order(Base):
     """ client_id = Column(Integer, ForeignKey("clients.id"), nullable=False) """
     client_phone = Column(String, nullable=False)
     client_name = Column(String, nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
     quantity = Column(Integer, nullable=False, default=1)
     total_price = Column(Numeric(10, 2), nullable=False, default=1)
     total_weight = Column(Numeric(10, 2), nullable=False, default=1)
@@ -38,6 +56,14 @@ class Order(Base):
     """ client = relationship("Client", back_populates="orders") """
     product = relationship("Product", back_populates="orders")
 
+    # Индексы под keyset-пагинацию (date, id) и фильтры GET /orders
+    __table_args__ = (
+        Index("ix_orders_date_id", "date", "id"),
+        Index("ix_orders_is_active_date_id", "is_active", "date", "id"),
+        Index("ix_orders_product_id_date_id", "product_id", "date", "id"),
+        Index("ix_orders_client_phone_date_id", "client_phone", "date", "id"),
+    )
+
 # Модель категории
 class Category(Base):
     __tablename__ = "categories"
@@ -72,13 +98,46 @@ class Product(Base):
     category_id = Column(
         Integer, 
         ForeignKey("categories.id", ondelete="SET NULL"),
-        nullable=True
+        nullable=True,
+        index=True
     )
 
     # Связи
     category = relationship("Category", back_populates="products")
-    orders = relationship("Order", back_populates="product", cascade="all, delete")
+    # Заказы удаляет каскад ON DELETE в БД, ORM не загружает их при удалении продукта
+    orders = relationship(
+        "Order",
+        back_populates="product",
+        cascade="all, delete",
+        passive_deletes=True
+    )
     
+# План производства: итоги заказов по (дата, продукт), ведутся триггерами на orders (миграция v0009)
+class ProductionPlan(Base):
+    __tablename__ = "production_plan"
+
+    date = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    order_count = Column(BigInteger, nullable=False, default=0)
+    quantity = Column(BigInteger, nullable=False, default=0)
+    total_weight = Column(Numeric(14, 2), nullable=False, default=0)
+    total_price = Column(Numeric(14, 2), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+# Итоги продаж по неделям и месяцам: пересчитываются analytics.py (миграция v0010)
+class SalesRollup(Base):
+    __tablename__ = "sales_rollup"
+
+    period = Column(String(5), primary_key=True)      # week | month
+    period_start = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    category_id = Column(Integer)
+    order_count = Column(BigInteger, nullable=False, default=0)
+    quantity = Column(BigInteger, nullable=False, default=0)
+    total_weight = Column(Numeric(14, 2), nullable=False, default=0)
+    total_price = Column(Numeric(14, 2), nullable=False, default=0)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
 # Модель фотографии
 class Photo(Base):
     __tablename__ = "photos"
@@ -87,7 +146,9 @@ class Photo(Base):
     title = Column(String, unique=True, nullable=False)
     filename = Column(String, nullable=False)
     content_type = Column(String, nullable=False)
-    data = Column(LargeBinary, nullable=False)
+    data = Column(LargeBinary, nullable=True)     # NULL, если байты в файловом хранилище
+    size = Column(Integer)
+    content_hash = Column(String(64), index=True)   # SHA-256 в hex
     
     
 # Модель пользователя
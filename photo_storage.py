@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+from typing import Optional
+from sqlalchemy import select, update
+import config
+from database import SessionLocal, engine
+from models import Photo
+from photo_variants import IMAGE_SIGNATURE_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+async def read_chunks(file, max_bytes: int):
+    # Загрузка читается порциями с контролем максимального размера
+    size = 0
+    while True:
+        chunk = await file.read(config.photo_upload_chunk_bytes)
+        if not chunk:
+            return
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge()
+        yield chunk
+
+
+class LocalFileStorage:
+    # Контентно-адресуемое хранилище: файл называется SHA-256 своего содержимого
+    in_database = False
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, content_hash: str) -> str:
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4], content_hash)
+
+    def exists(self, content_hash: str) -> bool:
+        return os.path.exists(self.path(content_hash))
+
+    def size(self, content_hash: str) -> int:
+        return os.path.getsize(self.path(content_hash))
+
+    async def put(self, content_hash: str, data: bytes) -> Optional[bytes]:
+        await asyncio.to_thread(self._write, content_hash, data)
+        return None  # В строке photos остаются только метаданные и хеш
+
+    def _write(self, content_hash: str, data: bytes):
+        path = self.path(content_hash)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Запись во временный файл и атомарное переименование: читатели не видят недописанный файл
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    async def save_upload(self, file, max_bytes: int, lock=None):
+        # Порции пишутся во временный файл с подсчётом хеша, в памяти одна порция.
+        # lock(content_hash) вызывается до переноса файла на место: удаление файла того же хеша ждёт его
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".upload")
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                async for chunk in read_chunks(file, max_bytes):
+                    if size == 0:
+                        head = chunk[:IMAGE_SIGNATURE_BYTES]
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(tmp_file.write, chunk)
+            content_hash = digest.hexdigest()
+            if lock is not None:
+                await lock(content_hash)
+            await asyncio.to_thread(self._commit, tmp_path, content_hash)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return content_hash, size, None, head
+
+    def _commit(self, tmp_path: str, content_hash: str):
+        path = self.path(content_hash)
+        if os.path.exists(path):
+            # Такой файл уже есть — второй экземпляр не храним
+            os.unlink(tmp_path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    async def read(self, content_hash: str) -> bytes:
+        return await asyncio.to_thread(self._read, content_hash)
+
+    def _read(self, content_hash: str) -> bytes:
+        with open(self.path(content_hash), "rb") as file:
+            return file.read()
+
+    async def read_range(self, content_hash: str, start: int, end: int) -> bytes:
+        return await asyncio.to_thread(self._read_range, content_hash, start, end)
+
+    def _read_range(self, content_hash: str, start: int, end: int) -> bytes:
+        with open(self.path(content_hash), "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[start:end + 1]
+
+    async def delete(self, content_hash: str):
+        try:
+            await asyncio.to_thread(os.unlink, self.path(content_hash))
+        except FileNotFoundError:
+            pass
+
+
+class PostgresBlobStorage:
+    # Байты хранятся в столбце photos.data, как раньше
+    in_database = True
+
+    async def put(self, content_hash: str, data: bytes) -> Optional[bytes]:
+        return data
+
+    async def save_upload(self, file, max_bytes: int, lock=None):
+        digest = hashlib.sha256()
+        buffer = bytearray()
+        async for chunk in read_chunks(file, max_bytes):
+            digest.update(chunk)
+            buffer += chunk
+        if lock is not None:
+            await lock(digest.hexdigest())
+        # bytearray передаётся драйверу без копирования в bytes
+        return digest.hexdigest(), len(buffer), buffer, bytes(buffer[:IMAGE_SIGNATURE_BYTES])
+
+
+# Файлы читаются всегда: при смене бэкенда в таблице могут быть строки обоих видов
+local_storage = LocalFileStorage(config.photo_storage_dir)
+photo_storage = local_storage if config.photo_storage_backend == "local" else PostgresBlobStorage()
+
+
+async def read_photo_data(photo, db) -> bytes:
+    if photo.data is not None:
+        return photo.data
+    if local_storage.exists(photo.content_hash):
+        return await local_storage.read(photo.content_hash)
+    # Повторная загрузка в БД: байты хранит другая строка с тем же хешем
+    result = await db.execute(
+        select(Photo.data).where(Photo.content_hash == photo.content_hash, Photo.data.is_not(None)).limit(1)
+    )
+    data = result.scalar()
+    if data is None:
+        raise FileNotFoundError(f"Нет данных фото {photo.content_hash}")
+    return data
+
+
+async def migrate_blobs(batch_size: int):
+    # Перенос байтов из photos.data в файловое хранилище порциями
+    if config.photo_storage_backend != "local":
+        logger.warning("PHOTO_STORAGE не равен 'local': новые фото по-прежнему будут сохраняться в БД")
+
+    moved = 0
+    last_id = 0
+    try:
+        while True:
+            async with SessionLocal() as db:
+                result = await db.execute(
+                    select(Photo.id, Photo.data)
+                    .where(Photo.id > last_id, Photo.data.is_not(None))
+                    .order_by(Photo.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                for row in rows:
+                    content_hash = hashlib.sha256(row.data).hexdigest()
+                    await local_storage.put(content_hash, row.data)
+                    await db.execute(
+                        update(Photo)
+                        .where(Photo.id == row.id)
+                        .values(data=None, size=len(row.data), content_hash=content_hash)
+                    )
+                await db.commit()
+                moved += len(rows)
+                last_id = rows[-1].id
+                logger.info(f"Перенесено фото: {moved}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(prog="python -m photo_storage", description="Хранилище фото")
+    parser.add_argument("command", choices=["migrate-blobs"])
+    parser.add_argument("--batch-size", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(migrate_blobs(args.batch_size))
@@ -0,0 +1,150 @@
+import asyncio
+import glob
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union
+import config
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+except ImportError:  # Pillow не установлен — варианты не создаются, отдаётся оригинал
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = "placeholder"
+VARIANTS = [f"w{width}" for width in config.photo_variant_widths] + [PLACEHOLDER]
+VARIANT_MEDIA_TYPE = "image/webp"
+
+
+# Сигнатуры форматов, которые декодирует Pillow: остальное (SVG, PDF, мусор) в пул не отправляется
+IMAGE_SIGNATURES = (
+    b"\xff\xd8\xff",           # JPEG
+    b"\x89PNG\r\n\x1a\n",      # PNG
+    b"GIF87a",
+    b"GIF89a",
+    b"BM",                      # BMP
+    b"II*\x00",                 # TIFF
+    b"MM\x00*",
+)
+IMAGE_SIGNATURE_BYTES = 12
+
+
+def is_raster_image(head: bytes) -> bool:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return True
+    return head.startswith(IMAGE_SIGNATURES)
+
+
+def variant_path(base_path: str, variant: str) -> str:
+    # Варианты лежат рядом с оригиналом: <путь оригинала>.<вариант>.webp
+    return f"{base_path}.{variant}.webp"
+
+
+def failure_marker_path(base_path: str) -> str:
+    # Метка неудачной генерации: такой файл Pillow не декодирует, повторять бессмысленно
+    return f"{base_path}.variants-failed"
+
+
+def delete_variants(base_path: str):
+    failed.discard(base_path)
+    paths = glob.glob(f"{glob.escape(base_path)}.*.webp") + [failure_marker_path(base_path)]
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def has_failed(base_path: str) -> bool:
+    return base_path in failed or os.path.exists(failure_marker_path(base_path))
+
+
+def mark_failed(base_path: str):
+    path = failure_marker_path(base_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb"):
+        pass
+
+
+def save_webp(image, path: str, quality: int):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            image.save(tmp_file, format="WEBP", quality=quality, method=4)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def generate_variants(source: Union[str, bytes, bytearray], base_path: str) -> int:
+    # Выполняется в отдельном процессе: декодирование изображений не блокирует event loop
+    with Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    created = 0
+    for width in config.photo_variant_widths:
+        resized = image.copy()
+        resized.thumbnail((width, width * 10), Image.LANCZOS)
+        save_webp(resized, variant_path(base_path, f"w{width}"), config.photo_variant_quality)
+        created += 1
+
+    # Крошечное размытое превью для показа до загрузки изображения
+    placeholder = image.copy()
+    placeholder.thumbnail((config.photo_placeholder_width, config.photo_placeholder_width))
+    placeholder = placeholder.filter(ImageFilter.GaussianBlur(1))
+    save_webp(placeholder, variant_path(base_path, PLACEHOLDER), 30)
+    return created + 1
+
+
+executor: Optional[ProcessPoolExecutor] = None
+pending = {}
+failed = set()    # base_path с неудачной генерацией в этом воркере; между воркерами — файл-метка
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global executor
+    if executor is None:
+        # spawn: дочерние процессы не наследуют event loop и соединения воркера
+        executor = ProcessPoolExecutor(
+            max_workers=config.photo_variant_processes,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return executor
+
+
+def schedule_variants(source: Union[str, bytes, bytearray], base_path: str):
+    # Не более одной попытки на файл: уже в очереди или уже не удалось
+    if Image is None or base_path in pending or has_failed(base_path):
+        return
+    task = asyncio.create_task(run_variants(source, base_path))
+    pending[base_path] = task
+    task.add_done_callback(lambda _: pending.pop(base_path, None))
+
+
+async def run_variants(source: Union[str, bytes, bytearray], base_path: str):
+    try:
+        loop = asyncio.get_running_loop()
+        created = await loop.run_in_executor(get_executor(), generate_variants, source, base_path)
+        logger.info(f"Создано вариантов фото: {created} ({os.path.basename(base_path)})")
+    except Exception as e:
+        logger.error(f"Не удалось создать варианты фото: {e}")
+        failed.add(base_path)
+        try:
+            await asyncio.to_thread(mark_failed, base_path)
+        except OSError as marker_error:
+            logger.error(f"Не удалось записать метку неудачной генерации: {marker_error}")
+
+
+def shutdown_executor():
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
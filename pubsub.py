@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, List, Optional
+import asyncpg
+import config
+
+logger = logging.getLogger(__name__)
+
+# Отдельное соединение asyncpg (не из пула SQLAlchemy) для LISTEN/NOTIFY между воркерами
+PUBSUB_DSN = f"postgresql://{config.user}:{config.password}@{config.host}:{config.port}/{config.dbname}"
+
+RECONNECT_DELAY_SEC = 1
+RECONNECT_MAX_DELAY_SEC = 30
+
+
+class PostgresPubSub:
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.connection: Optional[asyncpg.Connection] = None
+        self.handlers: Dict[str, List[Callable]] = {}
+        self.connect_callbacks: List[Callable] = []
+        self.lock = asyncio.Lock()
+        self.tasks = set()
+        self.closing = False
+
+    @property
+    def is_running(self) -> bool:
+        return self.connection is not None and not self.connection.is_closed()
+
+    def subscribe(self, channel: str, handler: Callable):
+        # Подписки регистрируются при импорте модулей, LISTEN выполняется в start()
+        self.handlers.setdefault(channel, []).append(handler)
+
+    def on_connect(self, callback: Callable):
+        # Вызывается после каждого (пере)подключения: уведомления за время разрыва могли потеряться
+        self.connect_callbacks.append(callback)
+
+    async def start(self):
+        self.closing = False
+        await self._connect()
+
+    async def stop(self):
+        self.closing = True
+        if self.is_running:
+            await self.connection.close()
+        self.connection = None
+
+    async def publish(self, channel: str, message: dict):
+        # Без слушателя (CLI, один процесс) сообщение доставляется локально
+        if not self.is_running:
+            self._dispatch(channel, message)
+            return
+        payload = json.dumps(message, ensure_ascii=False, default=str)
+        # Отправитель получит своё же уведомление через LISTEN, поэтому локально не доставляем
+        async with self.lock:
+            await self.connection.execute("SELECT pg_notify($1, $2)", channel, payload)
+
+    async def fetch(self, query: str, *args):
+        if not self.is_running:
+            return []
+        async with self.lock:
+            return await self.connection.fetch(query, *args)
+
+    async def _connect(self):
+        connection = await asyncpg.connect(self.dsn)
+        connection.add_termination_listener(self._on_termination)
+        for channel in self.handlers:
+            await connection.add_listener(channel, self._on_notification)
+        self.connection = connection
+        logger.info(f"Pub/Sub: подписка на каналы {list(self.handlers)}")
+        for callback in self.connect_callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"Pub/Sub: ошибка обработчика подключения: {e}")
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.error(f"Pub/Sub: некорректное сообщение в канале {channel}: {payload}")
+            return
+        self._dispatch(channel, message)
+
+    def _dispatch(self, channel: str, message: dict):
+        for handler in self.handlers.get(channel, []):
+            try:
+                result = handler(message)
+                if asyncio.iscoroutine(result):
+                    task = asyncio.create_task(result)
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+            except Exception as e:
+                logger.error(f"Pub/Sub: ошибка обработчика канала {channel}: {e}")
+
+    def _on_termination(self, connection):
+        if self.closing:
+            return
+        logger.warning("Pub/Sub: соединение со слушателем потеряно, переподключение")
+        self.connection = None
+        task = asyncio.create_task(self._reconnect())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _reconnect(self):
+        delay = RECONNECT_DELAY_SEC
+        while not self.closing:
+            try:
+                await self._connect()
+                return
+            except Exception as e:
+                logger.error(f"Pub/Sub: не удалось переподключиться: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY_SEC)
+
+
+pubsub = PostgresPubSub(PUBSUB_DSN)
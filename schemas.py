@@ -1,9 +1,27 @@
-from pydantic import BaseModel, field_validator, ValidationError, Field
+from pydantic import BaseModel, field_validator, model_validator, ValidationError, Field
 from datetime import date
+from datetime import date as date_type
 from datetime import datetime
-from typing import Optional
+from typing import ClassVar, FrozenSet, Optional
 import base64
 
+# Частичное обновление (PATCH)
+
+class PartialUpdate(BaseModel):
+    # Обновляются только переданные поля (exclude_unset), явный null очищает столбец.
+    # null для столбцов NOT NULL отклоняется здесь, а не ошибкой БД. Проверка идёт до валидаторов
+    # полей: унаследованные от *Base валидаторы не ожидают None
+    not_nullable: ClassVar[FrozenSet[str]] = frozenset()
+
+    @model_validator(mode="before")
+    @classmethod
+    def check_not_nullable(cls, data):
+        if isinstance(data, dict):
+            for name in sorted(cls.not_nullable):
+                if name in data and data[name] is None:
+                    raise ValueError(f"Поле '{name}' не может быть пустым")
+        return data
+
 # Клиент
  
 class ClientBase(BaseModel):
@@ -22,11 +40,23 @@ class ClientBase(BaseModel):
         description="Имя клиента (от 3 до 25 символов)."
     )
 
+class ClientPatch(PartialUpdate, ClientBase):
+    not_nullable = frozenset({"name", "phone"})
+    name: Optional[str] = Field(None, min_length=3, max_length=25)
+    phone: Optional[str] = Field(None, min_length=12, max_length=16)
+
 class Client(ClientBase):
     id: int
         
     class Config:
         orm_mode = True
+
+class ClientStats(BaseModel):
+    client_id: int
+    client_phone: str
+    order_count: int = 0
+    total_spent: float = 0
+    last_order_date: Optional[date] = None
     
 # Категория
 
@@ -36,6 +66,13 @@ class CategoryBase(BaseModel):
     img_URL: Optional[str] = ""
     img_title: Optional[str] = ""
 
+class CategoryPatch(PartialUpdate, CategoryBase):
+    not_nullable = frozenset({"title"})
+    title: Optional[str] = None
+    description: Optional[str] = None
+    img_URL: Optional[str] = None
+    img_title: Optional[str] = None
+
 class Category(CategoryBase):
     id: int
     
@@ -75,6 +112,17 @@ class ProductBase(BaseModel):
                 raise ValueError("Вес не может начинаться с '0' или быть в формате '00,00'")
         return v
              
+class ProductPatch(PartialUpdate, ProductBase):
+    not_nullable = frozenset({"title"})
+    title: Optional[str] = None
+    description: Optional[str] = None
+    img_URL: Optional[str] = None
+    img_title: Optional[str] = None
+    price_for_itm: Optional[float] = None
+    weight_for_itm: Optional[float] = None
+    is_active: Optional[bool] = None
+    category_id: Optional[int] = None
+
 class Product(ProductBase):
     id: int
 
@@ -172,6 +220,21 @@ class OrderBase(BaseModel):
                 raise ValueError("Вес не может начинаться с '0' или быть в формате '00,00'")
         return v
 
+class OrderPatch(PartialUpdate, OrderBase):
+    not_nullable = frozenset({
+        "client_phone", "client_name", "product_id", "quantity",
+        "total_price", "total_weight", "adres", "date",
+    })
+    client_phone: Optional[str] = Field(None, min_length=12, max_length=16)
+    client_name: Optional[str] = Field(None, min_length=3, max_length=25)
+    product_id: Optional[int] = None
+    quantity: Optional[int] = None
+    total_price: Optional[float] = None
+    total_weight: Optional[float] = None
+    is_active: Optional[bool] = None
+    # Псевдоним типа: имя поля date в теле класса перекрыло бы тип datetime.date
+    date: Optional[date_type] = None
+
 class Order(OrderBase):
     id: int
     
@@ -197,6 +260,42 @@ class Photo(PhotoBase):
         from_attributes = True
         orm_mode = True
 
+# План производства
+
+class ProductionPlanItem(BaseModel):
+    product_id: int
+    product_title: Optional[str] = None
+    order_count: int = 0
+    quantity: int = 0
+    total_weight: float = 0
+    total_price: float = 0
+
+# Аналитика
+
+class SalesTotals(BaseModel):
+    period_start: date
+    order_count: int = 0
+    quantity: int = 0
+    total_weight: float = 0
+    total_price: float = 0
+
+class ProductSales(SalesTotals):
+    product_id: int
+    product_title: Optional[str] = None
+
+class CategorySales(SalesTotals):
+    category_id: Optional[int] = None
+    category_title: Optional[str] = None
+
+class PhotoMeta(BaseModel):
+    id: int
+    title: str
+    filename: str
+    content_type: str
+    size: Optional[int] = None
+    content_hash: Optional[str] = None
+    url: str = Field(..., description="Адрес бинарных данных фото")
+
 class PhotoForUpdate(BaseModel):
     title: str = Field(..., min_length=5, max_length=100, description="Название фото")
 
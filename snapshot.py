@@ -0,0 +1,33 @@
+import gzip
+import json
+from typing import Dict, Optional
+from fastapi import Request, Response
+import config
+
+
+class JSONSnapshot:
+    # Заранее сериализованный (и сжатый) JSON-ответ, пересобирается только при изменении данных
+    def __init__(self, data):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.gzip_body = None
+        if len(self.body) >= config.snapshot_gzip_min_bytes:
+            self.gzip_body = gzip.compress(self.body, compresslevel=config.snapshot_gzip_level)
+
+
+def accepts_gzip(request: Request) -> bool:
+    for encoding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = encoding.strip().partition(";")
+        if name.strip() == "gzip" and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            return True
+    return False
+
+
+def snapshot_response(request: Request, snapshot: JSONSnapshot, cache_headers: Optional[Dict[str, str]] = None) -> Response:
+    headers = {**(cache_headers or {}), "Vary": "Accept-Encoding"}
+    if snapshot.gzip_body is not None and accepts_gzip(request):
+        headers["Content-Encoding"] = "gzip"
+        # У сжатого представления свой сильный ETag
+        if "ETag" in headers:
+            headers["ETag"] = headers["ETag"][:-1] + '-gzip"'
+        return Response(content=snapshot.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
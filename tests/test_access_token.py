@@ -0,0 +1,46 @@
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import config
+from auth.access_token import create_jwt_token, token_cache, verify_jwt_token
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_token_issued_right_after_user_revocation_is_valid():
+    old_token = create_jwt_token("revoked-user")
+    token_cache.apply_revocation({"username": "revoked-user", "revoked_at": time.time()})
+    new_token = create_jwt_token("revoked-user")
+
+    # Оба токена могут быть выданы в одну секунду с отзывом: решает iat с долями секунды
+    with pytest.raises(HTTPException) as error:
+        await verify_jwt_token(old_token)
+    assert error.value.status_code == 401
+    assert (await verify_jwt_token(new_token))["username"] == "revoked-user"
+
+
+def test_user_revocation_expires_with_last_token():
+    expired = time.time() - config.token_timedelta_sec_val - 1
+    token_cache.apply_revocation({"username": "old-user", "revoked_at": expired})
+    token_cache.apply_revocation({"username": "recent-user"})
+
+    assert "old-user" not in token_cache.revoked_users
+    assert "recent-user" in token_cache.revoked_users
+
+
+async def test_logout_revokes_token_and_clears_cookie():
+    from main import app
+
+    token = create_jwt_token("logout-user")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/logout", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert 'access_token=""' in response.headers["set-cookie"]
+
+        # Повторный выход тем же токеном: он уже отозван
+        response = await client.post("/logout", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
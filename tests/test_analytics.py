@@ -0,0 +1,45 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select, text
+
+import analytics
+from models import Order
+
+pytestmark = pytest.mark.anyio
+
+
+def order(product_id: int, day: date) -> Order:
+    return Order(
+        client_phone="+70000000001", client_name="Анна", product_id=product_id,
+        quantity=1, total_price=100, total_weight=1, adres="ул. Садовая, 1", date=day
+    )
+
+
+async def rollup_periods(db):
+    result = await db.execute(text("SELECT DISTINCT period_start FROM sales_rollup WHERE period = 'month'"))
+    return sorted(result.scalars().all())
+
+
+async def test_full_rebuild_drops_stale_periods(db, db_engine, product_id):
+    db.add(order(product_id, date(2024, 1, 10)))
+    await db.commit()
+    assert await analytics.refresh(db_engine)
+    assert await rollup_periods(db) == [date(2024, 1, 1)]
+
+    # Заказ перенесён на более поздний месяц: январских итогов быть не должно
+    saved = (await db.execute(select(Order))).scalar_one()
+    saved.date = date(2024, 3, 5)
+    await db.commit()
+    assert await analytics.refresh(db_engine)
+    assert await rollup_periods(db) == [date(2024, 3, 1)]
+
+
+async def test_recent_refresh_is_skipped(db, db_engine, product_id):
+    db.add(order(product_id, date.today()))
+    await db.commit()
+    since = date.today().replace(day=1)
+
+    assert await analytics.refresh(db_engine, since, min_interval=3600)
+    assert not await analytics.refresh(db_engine, since, min_interval=3600)
+    assert await analytics.refresh(db_engine, since, min_interval=0)
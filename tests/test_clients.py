@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import select
+
+from controllers.client_controllers import ClientControllers
+from models import Client
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_upsert_returns_new_and_existing_sorted_by_phone(db):
+    db.add(Client(name="Борис", phone="+70000000002"))
+    await db.commit()
+
+    rows = await ClientControllers.upsert_clients([
+        {"name": "Вера", "phone": "+70000000003"},
+        {"name": "Другое имя", "phone": "+70000000002"},
+        {"name": "Анна", "phone": "+70000000001"},
+        {"name": "Повтор", "phone": "+70000000003"},
+    ], db)
+    await db.commit()
+
+    assert [(row.phone, row.name, row.created) for row in rows] == [
+        ("+70000000001", "Анна", True),
+        ("+70000000002", "Борис", False),
+        ("+70000000003", "Вера", True),
+    ]
+    names = (await db.execute(select(Client.name).order_by(Client.phone))).scalars().all()
+    assert names == ["Анна", "Борис", "Вера"]
+
+
+async def test_create_client_reports_existing(db, client):
+    payload = {"name": "Анна", "phone": "+70000000001"}
+    first = await client.post("/clients", json=payload)
+    second = await client.post("/clients", json={**payload, "name": "Не Анна"})
+
+    assert first.status_code == 201 and first.json()["created"] is True
+    assert second.status_code == 200 and second.json()["created"] is False
+    assert second.json()["client"] == {**first.json()["client"], "name": "Анна"}
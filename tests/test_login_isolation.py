@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+
+from auth import passwords, rate_limit
+from models import Category, User
+
+pytestmark = pytest.mark.anyio
+
+FLOOD_CONCURRENCY = 16
+CATALOG_REQUESTS = 50
+# Проверка пароля «зависает» до сигнала теста, но не дольше этого: при bcrypt в event loop
+# каталог ждал бы её целиком, и тест падал бы, а не зависал
+CHECKPW_HOLD_SEC = 5
+
+
+async def test_catalog_is_served_while_logins_check_passwords(db, client, monkeypatch):
+    db.add(Category(title="Торты"))
+    db.add(User(name="admin", password="hash"))
+    await db.commit()
+    # Проверяется изоляция bcrypt, а не ограничение частоты: все попытки доходят до проверки пароля
+    for limiter in (rate_limit.login_ip_limiter, rate_limit.login_user_limiter):
+        monkeypatch.setattr(limiter, "capacity", 10 ** 6)
+        monkeypatch.setattr(limiter, "rate", 10 ** 6)
+
+    started, release = threading.Event(), threading.Event()
+
+    def held_checkpw(password, hashed):
+        started.set()
+        release.wait(CHECKPW_HOLD_SEC)
+        return False
+
+    monkeypatch.setattr(passwords.bcrypt, "checkpw", held_checkpw)
+
+    logins = [
+        asyncio.create_task(client.post("/login", json={"name": "admin", "password": "wrong-password"}))
+        for _ in range(FLOOD_CONCURRENCY)
+    ]
+    try:
+        assert await asyncio.to_thread(started.wait, CHECKPW_HOLD_SEC)
+        # Все проверки паролей заняты, а каталог отвечает: event loop не ждёт bcrypt
+        for _ in range(CATALOG_REQUESTS):
+            response = await client.get("/categories")
+            assert response.status_code == 200
+        assert not any(login.done() for login in logins)
+    finally:
+        release.set()
+        responses = await asyncio.gather(*logins)
+
+    assert [response.status_code for response in responses] == [401] * FLOOD_CONCURRENCY
@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import select
+from schemas import OrderPatch, ProductPatch
+
+pytestmark = pytest.mark.anyio
+
+
+def test_order_patch_accepts_date():
+    patch = OrderPatch.model_validate({"date": "2030-01-01"})
+    assert patch.model_dump(exclude_unset=True) == {"date": date(2030, 1, 1)}
+
+
+def test_explicit_null_is_kept_for_nullable_column():
+    patch = ProductPatch.model_validate({"category_id": None})
+    assert patch.model_dump(exclude_unset=True) == {"category_id": None}
+
+
+def test_null_for_not_null_column_is_rejected():
+    with pytest.raises(ValueError):
+        ProductPatch.model_validate({"title": None})
+
+
+async def test_patch_product_clears_category(client, db, product_id):
+    from models import Product
+
+    response = await client.patch(f"/products/{product_id}", json={"category_id": None})
+    assert response.status_code == 200
+
+    db.expire_all()
+    result = await db.execute(select(Product.title, Product.category_id).where(Product.id == product_id))
+    assert tuple(result.one()) == ("Наполеон", None)
+
+
+async def test_patch_order_changes_date(client, db, product_id):
+    from models import Order
+
+    order = Order(
+        client_phone="+79990000000", client_name="Анна", product_id=product_id,
+        quantity=1, total_price=100, total_weight=1, adres="Адрес", date=date.today()
+    )
+    db.add(order)
+    await db.flush()
+    order_id = order.id
+    await db.commit()
+
+    new_date = date.today() + timedelta(days=7)
+    response = await client.patch(f"/orders/{order_id}", json={"date": new_date.isoformat(), "comment": None})
+    assert response.status_code == 200
+
+    db.expire_all()
+    result = await db.execute(select(Order.date, Order.comment, Order.quantity).where(Order.id == order_id))
+    assert tuple(result.one()) == (new_date, None, 1)
+
+
+async def test_patch_rejects_null_title(client, db, product_id):
+    response = await client.patch(f"/products/{product_id}", json={"title": None})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("field", ["client_phone", "client_name", "date"])
+async def test_patch_order_rejects_null_for_validated_field(client, db, product_id, field):
+    from models import Order
+
+    order = Order(
+        client_phone="+79990000000", client_name="Анна", product_id=product_id,
+        quantity=1, total_price=100, total_weight=1, adres="Адрес", date=date.today()
+    )
+    db.add(order)
+    await db.flush()
+    order_id = order.id
+    await db.commit()
+
+    # Валидаторы OrderBase не принимают None: null отклоняется раньше них, с 422, а не 500
+    response = await client.patch(f"/orders/{order_id}", json={field: None})
+    assert response.status_code == 422
@@ -0,0 +1,56 @@
+import io
+import os
+
+import pytest
+
+import photo_variants
+from photo_variants import VARIANTS, failure_marker_path, has_failed, is_raster_image, variant_path
+
+pytestmark = pytest.mark.anyio
+
+PIL = pytest.importorskip("PIL.Image")
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    PIL.new("RGB", (32, 16), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_is_raster_image():
+    assert is_raster_image(png_bytes()[:12])
+    assert is_raster_image(b"RIFF\x00\x00\x00\x00WEBP")
+    assert is_raster_image(b"\xff\xd8\xff\xe0")
+    assert not is_raster_image(b"<svg xmlns=")
+    assert not is_raster_image(b"%PDF-1.7")
+    assert not is_raster_image(b"")
+
+
+async def test_failed_generation_is_not_requeued(tmp_path, monkeypatch):
+    base_path = str(tmp_path / "ab" / "abcdef")
+    calls = []
+
+    async def fake_run(source, path):
+        calls.append(path)
+
+    await photo_variants.run_variants(b"not an image", base_path)
+    assert has_failed(base_path)
+    assert os.path.exists(failure_marker_path(base_path))
+
+    # Метка переживает перезапуск воркера: в памяти сбоя уже нет
+    photo_variants.failed.discard(base_path)
+    monkeypatch.setattr(photo_variants, "run_variants", fake_run)
+    photo_variants.schedule_variants(base_path, base_path)
+    assert calls == []
+
+    photo_variants.delete_variants(base_path)
+    assert not has_failed(base_path)
+
+
+async def test_variants_created_for_image(tmp_path):
+    base_path = str(tmp_path / "cd" / "cdef01")
+    await photo_variants.run_variants(png_bytes(), base_path)
+    assert not has_failed(base_path)
+    assert all(os.path.exists(variant_path(base_path, variant)) for variant in VARIANTS)
+    photo_variants.delete_variants(base_path)
+    photo_variants.shutdown_executor()
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import func, select
+
+import photo_storage
+from controllers import photo_controllers
+from models import Photo
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = b"same bytes, not an image"
+
+
+async def upload(client, title: str, content: bytes = CONTENT):
+    return await client.post(
+        "/photos", data={"title": title}, files={"file": ("photo.bin", content, "application/octet-stream")}
+    )
+
+
+@pytest.fixture
+def local_storage(monkeypatch, tmp_path):
+    storage = photo_storage.LocalFileStorage(str(tmp_path))
+    monkeypatch.setattr(photo_storage, "local_storage", storage)
+    monkeypatch.setattr(photo_controllers, "local_storage", storage)
+    monkeypatch.setattr(photo_controllers, "photo_storage", storage)
+    return storage
+
+
+async def test_duplicate_upload_keeps_title_and_shares_bytes(db, client):
+    assert (await upload(client, "первое")).status_code == 201
+    assert (await upload(client, "второе")).status_code == 201
+
+    rows = (await db.execute(
+        select(Photo.id, Photo.title, func.octet_length(Photo.data).label("db_size")).order_by(Photo.id)
+    )).all()
+    assert [row.title for row in rows] == ["первое", "второе"]
+    # Байты хранятся один раз: вторая строка ссылается на них по content_hash
+    assert [row.db_size for row in rows] == [len(CONTENT), None]
+
+    for row in rows:
+        response = await client.get(f"/photos/{row.id}/raw")
+        assert response.status_code == 200
+        assert response.content == CONTENT
+    response = await client.get(f"/photos/{rows[1].id}/raw", headers={"Range": "bytes=0-3"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[:4]
+
+
+async def test_bytes_survive_deleting_holder(db, client):
+    await upload(client, "первое")
+    await upload(client, "второе")
+    first_id, second_id = (await db.execute(select(Photo.id).order_by(Photo.id))).scalars().all()
+    await db.commit()
+
+    assert (await client.delete(f"/photos/{first_id}")).status_code == 200
+
+    response = await client.get(f"/photos/{second_id}")
+    assert response.status_code == 200
+    response = await client.get(f"/photos/{second_id}/raw")
+    assert response.content == CONTENT
+    db_size = (await db.execute(select(func.octet_length(Photo.data)).where(Photo.id == second_id))).scalar()
+    assert db_size == len(CONTENT)
+
+
+async def test_delete_waits_for_duplicate_upload_of_same_file(db, client, local_storage):
+    await upload(client, "первое")
+    first_id = (await db.execute(select(Photo.id))).scalar_one()
+    await db.commit()
+
+    # Повторная загрузка останавливается после того, как увидела файл на месте, но до COMMIT строки
+    placed, resume = threading.Event(), threading.Event()
+    commit_file = local_storage._commit
+
+    def paused_commit(tmp_path, content_hash):
+        commit_file(tmp_path, content_hash)
+        placed.set()
+        resume.wait(5)
+
+    local_storage._commit = paused_commit
+    second = asyncio.create_task(upload(client, "второе"))
+    await asyncio.to_thread(placed.wait, 5)
+
+    deletion = asyncio.create_task(client.delete(f"/photos/{first_id}"))
+    await asyncio.sleep(0.3)
+    # Удаление ждёт блокировку хеша: файл, на который сошлётся новая строка, не удаляется
+    assert not deletion.done()
+    resume.set()
+    assert (await second).status_code == 201
+    assert (await deletion).status_code == 200
+
+    second_id = (await db.execute(select(Photo.id))).scalar_one()
+    response = await client.get(f"/photos/{second_id}/raw")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+async def test_rejected_duplicate_keeps_file_of_existing_photo(db, client, local_storage):
+    await upload(client, "первое")
+    assert (await upload(client, "первое")).status_code == 400
+
+    photo_id = (await db.execute(select(Photo.id))).scalar_one()
+    response = await client.get(f"/photos/{photo_id}/raw")
+    assert response.content == CONTENT
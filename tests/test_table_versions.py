@@ -0,0 +1,54 @@
+import asyncio
+import json
+import os
+
+import pytest
+from sqlalchemy import text
+
+from http_cache import TableVersions
+
+pytestmark = pytest.mark.anyio
+
+
+def test_out_of_order_version_replaces_token():
+    versions = TableVersions()
+    versions.on_notification({"table": "orders", "version": 8, "updated_at": 1.0})
+    # Транзакция с меньшим номером зафиксирована позже — это тоже новое состояние
+    versions.on_notification({"table": "orders", "version": 7, "updated_at": 2.0})
+    assert versions.get("orders") == ("7", 2.0)
+    assert versions.get("products") is None
+
+
+@pytest.fixture
+async def notifications(db_engine):
+    asyncpg = pytest.importorskip("asyncpg")
+    connection = await asyncpg.connect(os.environ["TEST_DATABASE_URL"])
+    received = []
+    await connection.add_listener(
+        "table_versions", lambda conn, pid, channel, payload: received.append(json.loads(payload))
+    )
+    yield received
+    await connection.close()
+
+
+async def wait_for(received, count: int):
+    for _ in range(50):
+        if len(received) >= count:
+            return
+        await asyncio.sleep(0.02)
+
+
+async def test_bump_skips_statements_without_rows(db, notifications):
+    await db.execute(text("UPDATE clients SET name = name WHERE false"))
+    await db.execute(text("DELETE FROM clients WHERE false"))
+    await db.commit()
+    await db.execute(text("INSERT INTO clients (name, phone) VALUES ('Анна', '+70000000001')"))
+    await db.commit()
+    await db.execute(text("INSERT INTO clients (name, phone) VALUES ('Борис', '+70000000002')"))
+    await db.commit()
+
+    await wait_for(notifications, 2)
+    await asyncio.sleep(0.1)
+    clients = [message for message in notifications if message["table"] == "clients"]
+    assert len(clients) == 2
+    assert clients[0]["version"] < clients[1]["version"]
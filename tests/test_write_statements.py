@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from controllers.category_controllers import CategoryControllers
+from controllers.client_controllers import ClientControllers
+from controllers.order_controllers import OrderControllers
+from controllers.photo_controllers import PhotoControllers
+from controllers.product_controllers import ProductControllers
+from controllers.user_controllers import UserControllers
+from models import Client, Order, Photo, Product, User
+from schemas import (
+    CategoryBase, CategoryPatch, ClientBase, ClientPatch, OrderBase, OrderPatch,
+    PhotoForUpdate, ProductBase, ProductPatch
+)
+
+pytestmark = pytest.mark.anyio
+
+MISSING_ID = 999999
+
+
+@pytest.fixture
+async def ids(db, product_id):
+    rows = {
+        "client": Client(name="Анна", phone="+70000000001"),
+        "order": Order(
+            client_phone="+70000000001", client_name="Анна", product_id=product_id, quantity=1,
+            total_price=100, total_weight=1, adres="ул. Садовая, 1", date=date.today()
+        ),
+        "photo": Photo(title="Торт", filename="cake.jpg", content_type="image/jpeg", data=b"x", size=1, content_hash="0" * 64),
+        "user": User(name="admin", password="hash"),
+    }
+    db.add_all(rows.values())
+    await db.flush()
+    result = {name: row.id for name, row in rows.items()}
+    result["product"] = product_id
+    result["category"] = (await db.get(Product, product_id)).category_id
+    await db.commit()
+    return result
+
+
+@pytest.fixture
+def statements(db_engine):
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(db_engine.sync_engine, "before_cursor_execute", count)
+
+
+def order_values(product_id: int) -> dict:
+    return {
+        "client_phone": "+70000000001", "client_name": "Анна", "product_id": product_id,
+        "adres": "ул. Садовая, 2", "date": date.today() + timedelta(days=1)
+    }
+
+
+# Вызов по id строки, число запросов, когда строка найдена, и число запросов прежнего пути
+# «SELECT строки, затем UPDATE или db.delete», замеренное на коммите до перехода на RETURNING.
+# Прежний del_product дополнительно удалял каждый заказ продукта отдельным DELETE (здесь заказов нет)
+# PATCH тогда ещё не было: для patch_* указано число запросов update_* того же ресурса
+WRITES = {
+    "update_category": (
+        lambda ids, id, db: CategoryControllers.update_category(id, CategoryBase(title="Пироги"), db), 1, 2
+    ),
+    "patch_category": (
+        lambda ids, id, db: CategoryControllers.update_category(id, CategoryPatch(title="Пироги"), db, partial=True), 1, 2
+    ),
+    "del_category": (lambda ids, id, db: CategoryControllers.del_category(id, db), 1, 2),
+    "update_product": (
+        lambda ids, id, db: ProductControllers.update_product(id, ProductBase(title="Медовик"), db), 1, 2
+    ),
+    "patch_product": (
+        lambda ids, id, db: ProductControllers.update_product(id, ProductPatch(price_for_itm=120), db, partial=True), 1, 2
+    ),
+    "del_product": (lambda ids, id, db: ProductControllers.del_product(id, db), 1, 4),
+    "update_client": (
+        lambda ids, id, db: ClientControllers.update_client(id, ClientBase(name="Анна", phone="+70000000009"), db), 1, 2
+    ),
+    "patch_client": (
+        lambda ids, id, db: ClientControllers.update_client(id, ClientPatch(name="Анна Б"), db, partial=True), 1, 2
+    ),
+    "del_client": (lambda ids, id, db: ClientControllers.del_client(id, db), 1, 2),
+    "update_order": (
+        lambda ids, id, db: OrderControllers.update_order(id, OrderBase(**order_values(ids["product"])), db), 1, 2
+    ),
+    "patch_order": (
+        lambda ids, id, db: OrderControllers.update_order(id, OrderPatch(quantity=2), db, partial=True), 1, 2
+    ),
+    "del_order": (lambda ids, id, db: OrderControllers.del_order(id, db), 1, 2),
+    "update_photo": (
+        lambda ids, id, db: PhotoControllers.update_photo(id, PhotoForUpdate(title="Торт 2"), db), 1, 2
+    ),
+    # Плюс блокировка хеша и проверка, ссылается ли ещё кто-то на тот же файл; прежний путь
+    # без блокировки тоже выполнял три запроса: SELECT, DELETE и ту же проверку
+    "del_photo": (lambda ids, id, db: PhotoControllers.del_photo(id, db), 3, 3),
+    "del_user": (lambda ids, id, db: UserControllers.del_user(id, db), 1, 2),
+}
+
+
+def target(name: str) -> str:
+    # update_order -> order
+    return name.split("_", 1)[1]
+
+
+@pytest.mark.parametrize("name", WRITES)
+async def test_write_statement_count(name, db, ids, statements):
+    write, expected, before = WRITES[name]
+    await write(ids, ids[target(name)], db)
+    assert len(statements) == expected, statements
+    assert expected <= before
+
+
+@pytest.mark.parametrize("name", WRITES)
+async def test_missing_row_is_404_after_one_statement(name, db, ids, statements):
+    write, _, _ = WRITES[name]
+    with pytest.raises(HTTPException) as error:
+        await write(ids, MISSING_ID, db)
+    assert error.value.status_code == 404
+    assert len(statements) == 1, statements
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+import config
+from WebSocket import ws
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_broadcast_keeps_burst_that_fits_outbox(monkeypatch):
+    published = []
+
+    async def slow_publish(channel, message):
+        await asyncio.sleep(0)
+        published.append(message)
+
+    monkeypatch.setattr(ws.pubsub, "publish", slow_publish)
+    manager = ws.WebSocketManager("test_outbox")
+    count = config.ws_send_queue_size * 3
+
+    # Большая корзина: уведомления о заказах ставятся подряд, быстрее, чем публикуются
+    for number in range(count):
+        await manager.broadcast({"number": number})
+    while not manager.outbox.empty():
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    await manager.stop()
+
+    assert [message["number"] for message in published] == list(range(count))
+    assert manager.metrics["outbox_dropped"] == 0
+
+
+async def test_broadcast_does_not_wait_for_stalled_publish(monkeypatch):
+    published = []
+    release = asyncio.Event()
+
+    async def stalled_publish(channel, message):
+        await release.wait()
+        published.append(message)
+
+    monkeypatch.setattr(ws.pubsub, "publish", stalled_publish)
+    monkeypatch.setattr(config, "ws_outbox_size", 10)
+    manager = ws.WebSocketManager("test_outbox_overflow")
+    count = 15
+
+    async def burst():
+        for number in range(count):
+            await manager.broadcast({"number": number})
+
+    # Публикация стоит: постановка в очередь всё равно завершается сразу, старые сообщения вытесняются
+    await asyncio.wait_for(burst(), timeout=1)
+    assert manager.metrics["outbox_dropped"] == count - 10
+
+    release.set()
+    while not manager.outbox.empty():
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    await manager.stop()
+    assert manager.publisher_task is None
+    assert [message["number"] for message in published] == list(range(count - 10, count))
+
+
+async def test_slow_consumer_close_task_is_kept_until_done(monkeypatch):
+    class StalledWebSocket:
+        closed = asyncio.Event()
+
+        async def accept(self):
+            pass
+
+        async def send_json(self, message):
+            await asyncio.sleep(3600)
+
+        async def close(self, code):
+            self.closed.set()
+
+    monkeypatch.setattr(config, "ws_overflow_policy", ws.OVERFLOW_DISCONNECT)
+    manager = ws.WebSocketManager("test_slow_close")
+    websocket = StalledWebSocket()
+    await manager.connect(websocket)
+
+    # Первое сообщение зависает в send_json, остальные заполняют очередь до отключения
+    for number in range(config.ws_send_queue_size + 2):
+        manager.send_local({"number": number})
+    assert manager.metrics["slow_disconnects"] == 1
+    assert len(manager.tasks) == 1
+    await asyncio.wait_for(websocket.closed.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert not manager.tasks
@@ -0,0 +1,95 @@
+import asyncio
+import multiprocessing
+import queue
+import time
+from collections import Counter
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+WORKERS = 3
+SENDERS = 2
+CONNECTIONS_PER_WORKER = 2
+# Меньше ws_send_queue_size: медленные клиенты проверяются отдельно, здесь ничего не теряется
+MESSAGES_PER_SENDER = 40
+DELIVERY_TIMEOUT_SEC = 15
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+
+async def worker_main(worker_id: int, ready, start, results):
+    # Отдельный процесс — отдельный воркер со своими модулями, своим LISTEN и своими соединениями
+    from pubsub import pubsub
+    from WebSocket.ws import manager
+
+    sockets = [FakeWebSocket() for _ in range(CONNECTIONS_PER_WORKER)]
+    for websocket in sockets:
+        await manager.connect(websocket)
+    await pubsub.start()
+    ready.put(worker_id)
+    await asyncio.get_running_loop().run_in_executor(None, start.wait)
+
+    if worker_id < SENDERS:
+        for number in range(MESSAGES_PER_SENDER):
+            await manager.broadcast({"worker": worker_id, "number": number})
+
+    expected = SENDERS * MESSAGES_PER_SENDER
+    deadline = time.monotonic() + DELIVERY_TIMEOUT_SEC
+    while time.monotonic() < deadline and any(len(websocket.sent) < expected for websocket in sockets):
+        await asyncio.sleep(0.05)
+    # Повторная доставка пришла бы следом: даём ей время проявиться
+    await asyncio.sleep(0.5)
+    results.put((worker_id, [websocket.sent for websocket in sockets]))
+    await pubsub.stop()
+
+
+def run_worker(worker_id: int, ready, start, results):
+    asyncio.run(worker_main(worker_id, ready, start, results))
+
+
+async def test_broadcast_reaches_every_connection_exactly_once(db_engine):
+    context = multiprocessing.get_context("spawn")
+    ready, results, start = context.Queue(), context.Queue(), context.Event()
+    processes = [
+        context.Process(target=run_worker, args=(worker_id, ready, start, results), daemon=True)
+        for worker_id in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for _ in processes:
+            await asyncio.to_thread(ready.get, timeout=DELIVERY_TIMEOUT_SEC)
+        start.set()
+        received = {}
+        for _ in processes:
+            worker_id, sockets = await asyncio.to_thread(results.get, timeout=DELIVERY_TIMEOUT_SEC * 2)
+            received[worker_id] = sockets
+    except queue.Empty:
+        pytest.fail("Воркер не ответил вовремя")
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    expected = Counter(
+        (sender, number) for sender in range(SENDERS) for number in range(MESSAGES_PER_SENDER)
+    )
+    for worker_id, sockets in received.items():
+        for sent in sockets:
+            # Каждое сообщение ровно один раз, включая соединения самого отправителя
+            assert Counter((message["worker"], message["number"]) for message in sent) == expected, worker_id
+            # Порядок сообщений одного отправителя сохраняется
+            for sender in range(SENDERS):
+                numbers = [message["number"] for message in sent if message["worker"] == sender]
+                assert numbers == list(range(MESSAGES_PER_SENDER))